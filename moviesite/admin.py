@@ -1,12 +1,136 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connection
+from django.forms.models import BaseInlineFormSet, BaseModelFormSet
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 from django.contrib.auth.models import Group
-from .models import Genre, Movie, Comment, UserProfile
+from .models import Genre, Movie, Comment, UserProfile, Task
+from .images import thumbnail_url
+from .search import fts_available, match_expression, matching_ids
+from .export import COMMENT_COLUMNS, MOVIE_COLUMNS, comment_rows, export_response, movie_rows
 
 
-class CommentInline(admin.StackedInline):
+def estimate_row_count(model):
+    """Cheap row estimate from the database, or None if unavailable."""
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [model._meta.db_table])
+        elif connection.vendor == "sqlite":
+            # MAX(rowid) is a single b-tree lookup; gaps make it an overestimate.
+            cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Skip the exact COUNT(*) on big, unfiltered changelists."""
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimate_row_count(self.object_list.model)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
+
+
+class PrimedAutocompleteSelect(AutocompleteSelect):
+    """Autocomplete widget that takes the selected labels from ``labels``.
+
+    The stock widget runs one query per form to find the selected option's
+    label; formsets fill ``labels`` from their select_related rows instead.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Shared by the shallow copies each form makes of the widget.
+        self.labels = {}
+
+    def optgroups(self, name, value, attr=None):
+        values = [str(v) for v in value if v]
+        if not values or any(v not in self.labels for v in values):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required and not self.allow_multiple_selected:
+            options.append(self.create_option(name, "", "", False, 0))
+        for index, v in enumerate(values, start=len(options)):
+            options.append(self.create_option(name, v, self.labels[v], True, index, attrs=attr))
+        return [(None, options, 0)]
+
+
+class PrimedAutocompleteMixin:
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request) and "widget" not in kwargs:
+            kwargs["widget"] = PrimedAutocompleteSelect(db_field, self.admin_site, using=kwargs.get("using"))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class PrimedFormSetMixin:
+    def prime_autocomplete(self, objects):
+        for name, field in self.form.base_fields.items():
+            widget = getattr(field.widget, "widget", field.widget)
+            if not isinstance(widget, PrimedAutocompleteSelect):
+                continue
+            for obj in objects:
+                related = getattr(obj, name)
+                if related is not None:
+                    widget.labels[str(related.pk)] = field.label_from_instance(related)
+
+
+class PrimedChangelistFormSet(PrimedFormSetMixin, BaseModelFormSet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prime_autocomplete(self.get_queryset())
+
+
+class PaginatedCommentFormSet(PrimedFormSetMixin, BaseInlineFormSet):
+    per_page = 20
+    page = 1
+
+    def get_queryset(self):
+        if not hasattr(self, "_page_queryset"):
+            comments = super().get_queryset()
+            start = (self.page - 1) * self.per_page
+            ids = list(comments.values_list("pk", flat=True)[start:start + self.per_page + 1])
+            self.has_next = len(ids) > self.per_page
+            self._page_queryset = comments.filter(pk__in=ids[:self.per_page]).select_related("user")
+            self.prime_autocomplete(self._page_queryset)
+        return self._page_queryset
+
+
+class CommentInline(PrimedAutocompleteMixin, admin.StackedInline):
     model = Comment
     extra = 0
+    formset = PaginatedCommentFormSet
+    autocomplete_fields = ('user',)
+    template = 'admin/moviesite/comment_inline.html'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        try:
+            formset.page = max(1, int(request.GET.get('comments_page', 1)))
+        except ValueError:
+            formset.page = 1
+        return formset
+
+
+class CommentAdmin(PrimedAutocompleteMixin, admin.ModelAdmin):
+    list_display = ('id', 'text', 'movie', 'user', 'created')
+    list_select_related = ('movie', 'user')
+    search_fields = ('text',)
+    autocomplete_fields = ('movie', 'user')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def lookup_allowed(self, lookup, value, request=None):
+        # The comment inline links here with ?movie__id__exact=<id>.
+        return lookup == 'movie__id__exact' or super().lookup_allowed(lookup, value, request)
 
 
 class GenreAdmin(admin.ModelAdmin):
@@ -17,7 +141,7 @@ class GenreAdmin(admin.ModelAdmin):
     fields = ('type',)
 
 
-class MovieAdmin(admin.ModelAdmin):
+class MovieAdmin(PrimedAutocompleteMixin, admin.ModelAdmin):
     list_display = (
         'id', 'title', 'director', 'genre',
         'author', 'release', 'published', 'get_image'
@@ -26,11 +150,45 @@ class MovieAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description')
     list_filter = ('genre', 'release')
     list_editable = ('director', 'genre', 'published', 'author')
+    list_select_related = ('genre', 'author')
+    autocomplete_fields = ('genre', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [CommentInline]
+    actions = ['export_movies_csv', 'export_movies_jsonl', 'export_comments_csv', 'export_comments_jsonl']
+
+    @admin.action(description="Tanlangan filmlarni CSV ga eksport qilish")
+    def export_movies_csv(self, request, queryset):
+        return export_response("csv", MOVIE_COLUMNS, movie_rows(queryset), "movies")
+
+    @admin.action(description="Tanlangan filmlarni JSONL ga eksport qilish")
+    def export_movies_jsonl(self, request, queryset):
+        return export_response("jsonl", MOVIE_COLUMNS, movie_rows(queryset), "movies")
+
+    @admin.action(description="Tanlangan filmlar izohlarini CSV ga eksport qilish")
+    def export_comments_csv(self, request, queryset):
+        comments = Comment.objects.filter(movie__in=queryset.values("pk"))
+        return export_response("csv", COMMENT_COLUMNS, comment_rows(comments), "comments")
+
+    @admin.action(description="Tanlangan filmlar izohlarini JSONL ga eksport qilish")
+    def export_comments_jsonl(self, request, queryset):
+        comments = Comment.objects.filter(movie__in=queryset.values("pk"))
+        return export_response("jsonl", COMMENT_COLUMNS, comment_rows(comments), "comments")
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault("formset", PrimedChangelistFormSet)
+        return super().get_changelist_formset(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not fts_available():
+            return super().get_search_results(request, queryset, search_term)
+        if not match_expression(search_term):
+            return queryset.none(), False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
 
     def get_image(self, obj: Movie):
         if obj.cover:
-            return mark_safe(f"<img src='{obj.cover.url}' width='60px' />")
+            return mark_safe(f"<img src='{thumbnail_url(obj.cover)}' width='60px' />")
         return "No Image"
     get_image.short_description = "Cover"
 
@@ -53,15 +211,23 @@ class UserProfileAdmin(admin.ModelAdmin):
 
     def get_avatar(self, obj):
         if obj.avatar:
-            return mark_safe(f"<img src='{obj.avatar.url}' width='40px' />")
+            return mark_safe(f"<img src='{thumbnail_url(obj.avatar)}' width='40px' />")
         return "No Avatar"
     get_avatar.short_description = "Avatar"
 
 
 
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'created', 'finished')
+    list_filter = ('status', 'name')
+    readonly_fields = ('locked_until', 'locked_by', 'started', 'finished', 'last_error')
+
+
 admin.site.register(Genre, GenreAdmin)
 admin.site.register(Movie, MovieAdmin)
 admin.site.register(UserProfile, UserProfileAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Task, TaskAdmin)
 admin.site.unregister(Group)
 
 @admin.register(Group)
@@ -0,0 +1,121 @@
+"""Async versions of the public read pages, used when ASYNC_VIEWS is on.
+
+Under ASGI a sync view holds a thread for the whole request, and a video
+download holds it until the last byte is sent. These views await the
+async ORM instead and stream video from an async iterator.
+
+Templates render in the event loop, where a lazy query would raise
+SynchronousOnlyOperation, so everything a template touches (including
+request.user) is loaded before rendering. The cache is called directly:
+the locmem, Redis and memcached backends don't use the database, and
+Django's async cache methods would only run the same call in a thread.
+"""
+from functools import wraps
+
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, render
+
+from . import views
+from .conditional import acatalog_validators, conditional_page
+from .counters import arecord_view
+from .models import Movie, UserProfile
+from .pagecache import add_cache_tags, anonymous_page_cache
+from .pagination import CursorPaginator
+from .querybudget import query_budget
+from .replica import replica_reads
+from .sidebar import aget_genre_sidebar
+from .streaming import serve_file
+from .template_backends import public_engine
+
+
+def load_user(view):
+    """Load request.user before the view and its decorators look at it."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+class LoadUserMixin:
+    """Class-based counterpart of load_user; goes first in the bases."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+@load_user
+@replica_reads
+@conditional_page(acatalog_validators)
+@anonymous_page_cache
+@query_budget(4)
+async def movie_list(request):
+    movies = Movie.objects.filter(published=True).select_related("genre", "author__profile")
+    paginator = CursorPaginator(movies, views.MOVIES_PER_PAGE)
+    page_obj = await paginator.aget_page(request.GET.get("cursor"))
+    genres = await aget_genre_sidebar()
+    views.tag_listing(request, genres, page_obj)
+    return render(request, "moviesite/main.html", {
+        "genres": genres,
+        "movies": page_obj.object_list,
+        "page_obj": page_obj,
+    }, using=public_engine())
+
+
+class MoviesByGenre(LoadUserMixin, views.MoviesByGenre):
+    async def get(self, request, *args, **kwargs):
+        self.select_genre(await aget_genre_sidebar())
+        paginator, page, movies, is_paginated = await self.apaginate_queryset(self.get_queryset(), self.paginate_by)
+        self.object_list = movies
+        context = self.get_context_data(paginator=paginator, page_obj=page, is_paginated=is_paginated)
+        return self.render_to_response(context)
+
+    def get_paginate_by(self, queryset):
+        # get() has already fetched the page.
+        return None
+
+
+class MovieDetail(LoadUserMixin, views.MovieDetail):
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(self.get_queryset(), pk=self.kwargs[self.pk_url_kwarg])
+        await arecord_view(self.object.pk)
+        add_cache_tags(request, f"movie:{self.object.pk}")
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
+    async def apage_cache_hit(self, request, *args, **kwargs):
+        await arecord_view(kwargs[self.pk_url_kwarg])
+
+    async def aget_validators(self):
+        updated = await Movie.objects.filter(
+            pk=self.kwargs[self.pk_url_kwarg]
+        ).values_list("updated", flat=True).afirst()
+        if updated is None:
+            return None
+        return updated.timestamp(), updated
+
+    async def anot_modified(self):
+        await arecord_view(self.kwargs[self.pk_url_kwarg])
+
+
+class ProfileDetail(LoadUserMixin, views.ProfileDetail):
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(
+            UserProfile.objects.select_related("user"),
+            user__username=self.kwargs["username"],
+        )
+        user = self.object.user
+        context = self.get_context_data(
+            object=self.object,
+            movie_count=await user.movie_set.acount(),
+            comment_count=await user.comment_set.acount(),
+        )
+        return self.render_to_response(context)
+
+
+async def movie_video(request, movie_id):
+    movie = await aget_object_or_404(Movie.objects.only("id", "video"), pk=movie_id)
+    if not movie.video:
+        raise Http404("Video topilmadi")
+    return serve_file(request, movie.video, asynchronous=True)
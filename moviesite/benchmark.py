@@ -0,0 +1,438 @@
+"""End-to-end page benchmarks for ``manage.py benchmark``.
+
+Each route is requested through the full middleware stack, either with
+Django's test client or by calling the WSGI application directly from a
+pool of threads. Results are latency percentiles, SQL queries per request
+and process RSS, written as JSON with sorted keys so a saved baseline
+diffs cleanly against a new run. ``run_slow_clients`` times pages while
+slow clients download a video, under WSGI or (with ASYNC_VIEWS) ASGI.
+``run_pagination`` times listing pages from the first to a deep one and
+``run_search`` compares FTS5 search with the icontains fallback.
+"""
+import asyncio
+import random
+import resource
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.cache import caches
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections, connections
+from django.template.loader import render_to_string
+from django.test import Client
+
+from .fragments import card_key
+from .models import Genre, Movie, UserProfile
+from .pagination import CursorPaginator
+from .querybudget import QueryCounter
+from .search import fts_available, like_search, search_movies
+from .sidebar import get_genre_sidebar
+
+# Outside INTERNAL_IPS, so the debug toolbar stays out of the numbers.
+REMOTE_ADDR = "198.51.100.7"
+SAMPLE_SIZE = 50
+DEEP_PAGE = 10_000
+# Common seed_catalog words, where icontains stops after a few rows, and a
+# word no movie has, where it reads the whole table.
+SEARCH_TERMS = ("shahar", "dark night", "kinoteatr")
+
+
+def _host():
+    hosts = [h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")]
+    return hosts[0] if hosts else "localhost"
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def rss_kib():
+    """Current resident set size, falling back to the peak where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _listing():
+    from .views import MOVIES_PER_PAGE
+    movies = Movie.objects.filter(published=True).select_related("genre", "author__profile")
+    return CursorPaginator(movies, MOVIES_PER_PAGE)
+
+
+def _deep_cursors(paginator, page):
+    """Cursors of ``page`` and the pages after it, or before the last page."""
+    last = -(-paginator.queryset.count() // paginator.per_page)
+    first = max(2, min(page, last - SAMPLE_SIZE + 1))
+    return [c for c in (paginator.cursor_for_page(n) for n in range(first, min(first + SAMPLE_SIZE, last + 1))) if c]
+
+
+def build_routes(seed=0, deep_page=DEEP_PAGE):
+    """{name: [url, ...]} sampled from the current catalog."""
+    rng = random.Random(seed)
+    movies = list(Movie.objects.filter(published=True).order_by("-views").values_list("id", flat=True)[:SAMPLE_SIZE * 4])
+    genres = list(Genre.objects.filter(movies__published=True).distinct().values_list("id", flat=True)[:SAMPLE_SIZE])
+    users = list(UserProfile.objects.values_list("user__username", flat=True)[:SAMPLE_SIZE])
+    routes = {"main": ["/"]}
+    deep = _deep_cursors(_listing(), deep_page)
+    if deep:
+        routes["main_deep"] = [f"/?cursor={cursor}" for cursor in deep]
+    if genres:
+        routes["genre"] = [f"/genre/{pk}/" for pk in genres]
+    if movies:
+        routes["movie"] = [f"/movie/{pk}/" for pk in rng.sample(movies, min(len(movies), SAMPLE_SIZE))]
+    if users:
+        routes["profile"] = [f"/profile/{name}/" for name in users]
+    # JSON counterparts of the HTML routes above, for requests/s side by side.
+    routes["api_movies"] = ["/api/v1/movies/"]
+    if genres:
+        routes["api_genre"] = [f"/api/v1/movies/?genre={pk}" for pk in genres]
+    if movies:
+        routes["api_movie"] = [url.replace("/movie/", "/api/v1/movies/") for url in routes["movie"]]
+    if users:
+        routes["api_profile"] = [f"/api/v1/profiles/{name}/" for name in users]
+    routes["search"] = [f"/search/?q={term.replace(' ', '+')}" for term in SEARCH_TERMS]
+    routes["admin_movies"] = ["/admin/moviesite/movie/"]
+    return routes
+
+
+def admin_cookie(username):
+    """Session cookie header for a superuser, or None if there is none."""
+    user = User.objects.filter(is_superuser=True, is_active=True)
+    user = (user.filter(username=username) if username else user).first()
+    if user is None:
+        return None
+    client = Client()
+    client.force_login(user)
+    return f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+
+def _timed(send, url):
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(counter))
+        started = time.perf_counter()
+        status = send(url)
+        elapsed = time.perf_counter() - started
+    return status, elapsed, len(counter.queries)
+
+
+class BenchmarkClient(Client):
+    """Test client that doesn't record rendered templates.
+
+    With DEBUG the debug toolbar instruments template rendering, and the
+    plain client would copy every context into each response; a changelist
+    renders thousands. Cookies and exceptions are not tracked either.
+    """
+
+    def request(self, **request):
+        return self.handler(self._base_environ(**request))
+
+
+def client_sender(cookie=None):
+    client = BenchmarkClient(HTTP_HOST=_host(), REMOTE_ADDR=REMOTE_ADDR)
+    if cookie:
+        client.defaults["HTTP_COOKIE"] = cookie
+
+    def send(url):
+        return client.get(url).status_code
+    return send
+
+
+def wsgi_sender(cookie=None, read_delay=0):
+    """``read_delay`` seconds between body chunks mimic a slow client."""
+    application = get_wsgi_application()
+
+    def send(url):
+        path, _, query = url.partition("?")
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": _host(),
+            "SERVER_PORT": "80",
+            "HTTP_HOST": _host(),
+            "REMOTE_ADDR": REMOTE_ADDR,
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(),
+            "wsgi.errors": BytesIO(),
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        if cookie:
+            environ["HTTP_COOKIE"] = cookie
+        status = []
+        body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            for _ in body:
+                if read_delay:
+                    time.sleep(read_delay)
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+        return int(status[0].split()[0])
+    return send
+
+
+def run_route(urls, requests, mode="client", concurrency=1, warmup=5, cookie=None):
+    """Request ``urls`` round-robin and return the route's statistics."""
+    make_sender = wsgi_sender if mode == "wsgi" else client_sender
+    timings, queries, errors = [], [], []
+    lock = threading.Lock()
+    per_thread = max(1, requests // concurrency)
+
+    def worker(offset):
+        send = make_sender(cookie)
+        try:
+            for i in range(warmup):
+                send(urls[(offset + i) % len(urls)])
+            for i in range(per_thread):
+                status, elapsed, count = _timed(send, urls[(offset + i) % len(urls)])
+                with lock:
+                    timings.append(elapsed)
+                    queries.append(count)
+                    if status >= 400:
+                        errors.append(status)
+        finally:
+            close_old_connections()
+
+    rss_before = rss_kib()
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker(0)
+    else:
+        threads = [threading.Thread(target=worker, args=(i * 7,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - started
+
+    ms = [t * 1000 for t in timings]
+    return {
+        "requests": len(timings),
+        "errors": len(errors),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "mean_ms": round(statistics.fmean(ms), 2),
+        "requests_per_s": round(len(timings) / wall, 1) if wall else None,
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "max_queries": max(queries),
+        "rss_kib": rss_kib(),
+        "rss_growth_kib": rss_kib() - rss_before,
+    }
+
+
+def asgi_sender(application, read_delay=0):
+    async def send(url):
+        path, _, query = url.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": [(b"host", _host().encode())],
+            "client": (REMOTE_ADDR, 50000),
+            "server": (_host(), 80),
+        }
+        requests = [{"type": "http.request", "body": b"", "more_body": False}]
+        done = asyncio.Event()
+        status = None
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            # Django listens for a disconnect while the response is sent.
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send_message(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif read_delay and message.get("more_body"):
+                await asyncio.sleep(read_delay)
+
+        try:
+            await application(scope, receive, send_message)
+        finally:
+            done.set()
+        return status
+    return send
+
+
+def find_video_url():
+    pk = Movie.objects.exclude(video="").values_list("id", flat=True).first()
+    return f"/movie/{pk}/video/" if pk else None
+
+
+def run_slow_clients(video_url, page_urls, clients, requests, read_delay, workers):
+    """Page latency while ``clients`` slow clients keep downloading ``video_url``.
+
+    With ASYNC_VIEWS the site is called as ASGI in one event loop, otherwise
+    as WSGI from a pool of ``workers`` threads, like a threaded server; run
+    it once with each setting to compare. Page requests are sent one after
+    another and timed from submission, so time spent waiting for a free
+    worker counts.
+    """
+    if settings.ASYNC_VIEWS:
+        timings, downloads = asyncio.run(_slow_clients_asgi(video_url, page_urls, clients, requests, read_delay))
+    else:
+        timings, downloads = _slow_clients_wsgi(video_url, page_urls, clients, requests, read_delay, workers)
+    ms = [t * 1000 for t in timings]
+    return {
+        "server": "asgi" if settings.ASYNC_VIEWS else f"wsgi, {workers} threads",
+        "clients": clients,
+        "page_requests": len(ms),
+        "page_p50_ms": round(percentile(ms, 50), 2),
+        "page_p95_ms": round(percentile(ms, 95), 2),
+        "downloads": len(downloads),
+        "download_mean_s": round(statistics.fmean(downloads), 2) if downloads else None,
+    }
+
+
+def _slow_clients_wsgi(video_url, page_urls, clients, requests, read_delay, workers):
+    slow, fast = wsgi_sender(read_delay=read_delay), wsgi_sender()
+    stop = threading.Event()
+    downloads = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def download():
+            started = time.perf_counter()
+            slow(video_url)
+            downloads.append(time.perf_counter() - started)
+            # The client asks again, behind whatever is queued by now.
+            if not stop.is_set():
+                pool.submit(download)
+
+        for _ in range(clients):
+            pool.submit(download)
+        time.sleep(read_delay)
+        timings = []
+        for i in range(requests):
+            started = time.perf_counter()
+            pool.submit(fast, page_urls[i % len(page_urls)]).result()
+            timings.append(time.perf_counter() - started)
+        stop.set()
+    return timings, downloads
+
+
+async def _slow_clients_asgi(video_url, page_urls, clients, requests, read_delay):
+    application = get_asgi_application()
+    slow, fast = asgi_sender(application, read_delay), asgi_sender(application)
+    stop = asyncio.Event()
+    downloads = []
+
+    async def download():
+        while not stop.is_set():
+            started = time.perf_counter()
+            await slow(video_url)
+            downloads.append(time.perf_counter() - started)
+
+    running = [asyncio.create_task(download()) for _ in range(clients)]
+    await asyncio.sleep(read_delay)
+    timings = []
+    for i in range(requests):
+        started = time.perf_counter()
+        await fast(page_urls[i % len(page_urls)])
+        timings.append(time.perf_counter() - started)
+    stop.set()
+    await asyncio.gather(*running)
+    return timings, downloads
+
+
+def run_pagination(pages, rounds):
+    """get_page() latency at each page number, past the page cache.
+
+    Pages beyond the end of the catalog are skipped; keyset pages should
+    cost the same at any depth.
+    """
+    paginator = _listing()
+    stats = {}
+    for number in pages:
+        cursor = paginator.cursor_for_page(number)
+        if number > 1 and cursor is None:
+            continue
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            paginator.get_page(cursor)
+            timings.append((time.perf_counter() - started) * 1000)
+        stats[f"page_{number}_p50_ms"] = round(percentile(timings, 50), 3)
+    return stats
+
+
+def run_search(terms, rounds):
+    """search_movies() against the icontains fallback for each term."""
+    stats = {"movies": Movie.objects.count()}
+    engines = {"like": like_search}
+    if fts_available():
+        engines["fts"] = search_movies
+    for term in terms:
+        for engine, search in engines.items():
+            timings = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                search(term)
+                timings.append((time.perf_counter() - started) * 1000)
+            stats[f"{term}_{engine}_p50_ms"] = round(percentile(timings, 50), 2)
+    return stats
+
+
+def run_cards(count, rounds):
+    """Render a listing page with ``count`` cards, without and with cached fragments."""
+    movies = list(Movie.objects.filter(published=True).select_related("genre", "author__profile")[:count])
+    context = {"movies": movies, "genres": get_genre_sidebar()}
+    stats = {"cards": len(movies)}
+    for name, clear in (("cold", True), ("warm", False)):
+        timings = []
+        render_to_string("moviesite/main.html", context)
+        for _ in range(rounds):
+            if clear:
+                caches[getattr(settings, "FRAGMENT_CACHE", "default")].delete_many(
+                    [card_key(movie) for movie in movies]
+                )
+            started = time.perf_counter()
+            render_to_string("moviesite/main.html", context)
+            timings.append((time.perf_counter() - started) * 1000)
+        stats[f"{name}_p50_ms"] = round(percentile(timings, 50), 2)
+        stats[f"{name}_p95_ms"] = round(percentile(timings, 95), 2)
+    return stats
+
+
+def compare(baseline, results, tolerance):
+    """Lines describing routes that got slower or run more queries."""
+    regressions = []
+    for name, current in results["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if not before:
+            continue
+        if current["queries_per_request"] > before["queries_per_request"]:
+            regressions.append(
+                f"{name}: queries per request {before['queries_per_request']} -> {current['queries_per_request']}"
+            )
+        for key in ("p50_ms", "p95_ms"):
+            if before[key] and current[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {before[key]} -> {current[key]}")
+    return regressions
@@ -0,0 +1,195 @@
+"""ETag/Last-Modified validators checked before a page is built.
+
+Movie pages use ``Movie.updated`` (one primary-key lookup). Listing pages
+use a catalog-wide version bumped whenever a movie or genre changes. It is
+kept in a database row, so every worker sees the bump, and reading it is
+one primary-key lookup as well.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.db.models import F
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import CatalogVersion
+from .replica import primary_reads
+
+CATALOG_VERSION_PK = 1
+
+
+def _version_row():
+    return CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK)
+
+
+def catalog_version():
+    version = _version_row().values_list("version", flat=True).first()
+    if version is None:
+        # A fresh number, so a recreated row never matches an old ETag.
+        version = CatalogVersion.objects.get_or_create(
+            pk=CATALOG_VERSION_PK, defaults={"version": time.time_ns()},
+        )[0].version
+    return version
+
+
+async def acatalog_version():
+    version = await _version_row().values_list("version", flat=True).afirst()
+    if version is None:
+        version = await sync_to_async(catalog_version)()
+    return version
+
+
+def bump_catalog_version():
+    if not _version_row().update(version=F("version") + 1):
+        catalog_version()
+
+
+def _make_etag(request, version):
+    # Pages show who is logged in, so the validator is per user.
+    user = request.user.pk if request.user.is_authenticated else 0
+    raw = f"{request.get_full_path()}|{user}|{version}"
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def _skip(request):
+    return request.method not in ("GET", "HEAD") or len(get_messages(request))
+
+
+def _validate(request, found):
+    """(etag, last_modified, 304 response or None) for the validators found."""
+    version, last_modified = found
+    etag = _make_etag(request, version)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    return etag, last_modified, get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def _revalidate(response):
+    # Always revalidate; the page is still allowed in private caches.
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ["Cookie"])
+    return response
+
+
+def _add_validators(response, etag, last_modified):
+    if response.status_code != 200:
+        return response
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    return _revalidate(response)
+
+
+def serve_conditional(request, get_response, validators, on_not_modified=None):
+    """``validators()`` returns (version, last_modified) or None."""
+    if _skip(request):
+        return get_response()
+    with primary_reads():
+        found = validators()
+    if found is None:
+        return get_response()
+
+    etag, last_modified, response = _validate(request, found)
+    if response is not None:
+        if on_not_modified is not None:
+            on_not_modified()
+        return _revalidate(response)
+    return _add_validators(get_response(), etag, last_modified)
+
+
+async def aserve_conditional(request, get_response, validators, on_not_modified=None):
+    """serve_conditional() for async views; the callbacks return awaitables."""
+    if _skip(request):
+        return await get_response()
+    with primary_reads():
+        found = await validators()
+    if found is None:
+        return await get_response()
+
+    etag, last_modified, response = _validate(request, found)
+    if response is not None:
+        if on_not_modified is not None:
+            await on_not_modified()
+        return _revalidate(response)
+    return _add_validators(await get_response(), etag, last_modified)
+
+
+def _awaitable(func):
+    if iscoroutinefunction(func):
+        return func
+
+    async def call(*args, **kwargs):
+        return func(*args, **kwargs)
+    return call
+
+
+def conditional_page(validators):
+    """Function view decorator; ``validators(request, *args, **kwargs)``.
+
+    On an async view a plain ``validators`` function runs in the event
+    loop, so it may use the cache but not the database; pass an async one
+    such as ``acatalog_validators`` to query.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            avalidators = _awaitable(validators)
+
+            async def wrapper(request, *args, **kwargs):
+                return await aserve_conditional(
+                    request,
+                    lambda: view(request, *args, **kwargs),
+                    lambda: avalidators(request, *args, **kwargs),
+                )
+        else:
+            def wrapper(request, *args, **kwargs):
+                return serve_conditional(
+                    request,
+                    lambda: view(request, *args, **kwargs),
+                    lambda: validators(request, *args, **kwargs),
+                )
+        return wraps(view)(wrapper)
+    return decorator
+
+
+def catalog_validators(request, *args, **kwargs):
+    return catalog_version(), None
+
+
+async def acatalog_validators(request, *args, **kwargs):
+    return await acatalog_version(), None
+
+
+class ConditionalPageMixin:
+    """Answer 304 before dispatch; override ``get_validators()``.
+
+    Async views override ``aget_validators()`` and ``anot_modified()``.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return aserve_conditional(
+                request,
+                lambda: super(ConditionalPageMixin, self).dispatch(request, *args, **kwargs),
+                self.aget_validators,
+                on_not_modified=self.anot_modified,
+            )
+        return serve_conditional(
+            request,
+            lambda: super(ConditionalPageMixin, self).dispatch(request, *args, **kwargs),
+            self.get_validators,
+            on_not_modified=self.not_modified,
+        )
+
+    def get_validators(self):
+        return catalog_validators(self.request)
+
+    def not_modified(self):
+        pass
+
+    async def aget_validators(self):
+        return await acatalog_validators(self.request)
+
+    async def anot_modified(self):
+        pass
@@ -0,0 +1,173 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from .models import Movie
+from .writer import run_write
+
+KEY_PREFIX = "movie_views"
+FLUSH_LOCK_KEY = f"{KEY_PREFIX}:flush_lock"
+# Held while a flush runs, so two flushes never write the same views.
+FLUSHING_KEY = f"{KEY_PREFIX}:flushing"
+FLUSHING_TIMEOUT = 300  # seconds
+# Movies with buffered views are logged as dirty:<seq> -> movie id.
+DIRTY_SEQ_KEY = f"{KEY_PREFIX}:dirty_seq"
+DIRTY_READ_KEY = f"{KEY_PREFIX}:dirty_read"
+BATCH_SIZE = 500
+
+
+def _cache():
+    return caches[getattr(settings, "VIEW_COUNTER_CACHE", "default")]
+
+
+def _flush_interval():
+    return getattr(settings, "VIEW_COUNTER_FLUSH_INTERVAL", 60)
+
+
+def _key(movie_id):
+    return f"{KEY_PREFIX}:{movie_id}"
+
+
+def _dirty_key(movie_id):
+    return f"{KEY_PREFIX}:dirty_flag:{movie_id}"
+
+
+def _log_key(seq):
+    return f"{KEY_PREFIX}:dirty:{seq}"
+
+
+def buffer_is_shared():
+    """False when each process keeps its own buffer (LocMemCache)."""
+    return not isinstance(_cache(), LocMemCache)
+
+
+def _incr(cache, key):
+    # add() is a no-op when the key exists; incr() itself is atomic.
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key was evicted between add() and incr().
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def _buffer_view(movie_id):
+    cache = _cache()
+    _incr(cache, _key(movie_id))
+    # The movie is logged once per flush, however many views it gets. The
+    # flag expires in case this process dies before writing the log entry.
+    if cache.add(_dirty_key(movie_id), 1, timeout=_flush_interval() * 10 or None):
+        cache.set(_log_key(_incr(cache, DIRTY_SEQ_KEY)), movie_id, timeout=None)
+
+
+def record_view(movie_id):
+    """Buffer one page view and flush the buffer if the interval has passed."""
+    _buffer_view(movie_id)
+    maybe_flush()
+
+
+async def arecord_view(movie_id):
+    """record_view() for async views; only the rare flush leaves the event loop."""
+    _buffer_view(movie_id)
+    if _flush_due():
+        await sync_to_async(_schedule_flush)()
+
+
+def _flush_due():
+    # Only one process gets to schedule a flush per interval.
+    return _cache().add(FLUSH_LOCK_KEY, 1, timeout=_flush_interval())
+
+
+def maybe_flush():
+    if _flush_due():
+        _schedule_flush()
+
+
+def _schedule_flush():
+    if not buffer_is_shared():
+        # The buffer lives in this process, a worker could not see it.
+        flush_views()
+    else:
+        from .taskqueue import enqueue
+        from .tasks import flush_movie_views
+        enqueue(flush_movie_views, max_attempts=1)
+
+
+def flush_views(movie_ids=None):
+    """Write buffered views to the database as ``F('views') + n``.
+
+    Only movies logged as dirty since the last flush are read. The written
+    amount is then subtracted from the buffer with decr(), so views recorded
+    while the flush is running are kept for the next one. Returns the
+    number of views written; 0 if another flush is running.
+    """
+    cache = _cache()
+    if not cache.add(FLUSHING_KEY, 1, timeout=FLUSHING_TIMEOUT):
+        return 0
+    try:
+        if movie_ids is None:
+            movie_ids = _take_dirty(cache)
+        total = 0
+        movie_ids = list(movie_ids)
+        for start in range(0, len(movie_ids), BATCH_SIZE):
+            total += _flush_batch(cache, movie_ids[start:start + BATCH_SIZE])
+        return total
+    finally:
+        cache.delete(FLUSHING_KEY)
+
+
+def _take_dirty(cache):
+    """Ids of the movies logged since the last flush.
+
+    Their flags are cleared before the counts are read, so a view from now
+    on logs its movie again and is never left unflushed.
+    """
+    read, unwritten = cache.get(DIRTY_READ_KEY, (0, ()))
+    end = cache.get(DIRTY_SEQ_KEY, 0)
+    if end < read:
+        # The cache was cleared and the sequence started over.
+        read, unwritten = 0, ()
+    seqs = {_log_key(seq): seq for seq in (*unwritten, *range(read + 1, end + 1))}
+    logged = cache.get_many(seqs)
+    # A writer may have taken a number without setting its entry yet; look
+    # once more on the next flush.
+    missing = [seq for key, seq in seqs.items() if key not in logged and seq not in unwritten]
+    cache.set(DIRTY_READ_KEY, (end, missing), timeout=None)
+    movie_ids = sorted(set(logged.values()))
+    cache.delete_many([_dirty_key(movie_id) for movie_id in movie_ids])
+    cache.delete_many(logged)
+    return movie_ids
+
+
+def _write_counts(counts):
+    with transaction.atomic():
+        Movie.objects.filter(pk__in=counts).update(
+            views=F("views") + Case(
+                *[When(pk=pk, then=Value(count)) for pk, count in counts.items()],
+                default=Value(0),
+            )
+        )
+
+
+def _flush_batch(cache, movie_ids):
+    keys = {_key(movie_id): movie_id for movie_id in movie_ids}
+    counts = {
+        keys[key]: count
+        for key, count in cache.get_many(keys).items()
+        if count
+    }
+    if not counts:
+        return 0
+
+    run_write(_write_counts, counts)
+
+    for movie_id, count in counts.items():
+        try:
+            cache.decr(_key(movie_id), count)
+        except ValueError:
+            pass
+    return sum(counts.values())
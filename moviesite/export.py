@@ -0,0 +1,64 @@
+"""Streaming CSV/JSONL export of movies and comments.
+
+Rows are read with values_list().iterator(), so no model instances are
+built and only ``chunk_size`` rows are held in memory at a time.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .models import Comment, Movie
+
+CHUNK_SIZE = 2000
+
+MOVIE_COLUMNS = [
+    "id", "title", "director", "description", "genre__type",
+    "author__username", "release", "views", "published",
+]
+COMMENT_COLUMNS = ["id", "movie_id", "movie__title", "user__username", "text", "created"]
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+
+class Echo:
+    """File-like object whose write() just returns the value (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def movie_rows(queryset=None, chunk_size=CHUNK_SIZE):
+    queryset = Movie.objects.all() if queryset is None else queryset
+    return queryset.order_by("pk").values_list(*MOVIE_COLUMNS).iterator(chunk_size=chunk_size)
+
+
+def comment_rows(queryset=None, chunk_size=CHUNK_SIZE):
+    queryset = Comment.objects.all() if queryset is None else queryset
+    return queryset.order_by("pk").values_list(*COMMENT_COLUMNS).iterator(chunk_size=chunk_size)
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(columns, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + "\n"
+
+
+def export_lines(fmt, columns, rows):
+    return csv_lines(columns, rows) if fmt == "csv" else jsonl_lines(columns, rows)
+
+
+def export_response(fmt, columns, rows, filename):
+    response = StreamingHttpResponse(export_lines(fmt, columns, rows), content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -1,7 +1,13 @@
 from django import forms
-from .models import Genre, Movie
+from .models import Genre, Movie, VideoUpload
 
 class MovieForm(forms.ModelForm):
+    video_upload = forms.ModelChoiceField(
+        queryset=VideoUpload.objects.filter(completed=True),
+        required=False,
+        widget=forms.HiddenInput,
+    )
+
     class Meta:
         model = Movie
         exclude = ['views']
@@ -0,0 +1,48 @@
+"""Rendered movie cards cached as HTML fragments.
+
+A card's key holds the movie id and a version stamp built from
+``Movie.updated`` and the author's name, so editing a movie moves it to a
+new key and unchanged cards are reused as they are. A listing fetches all
+its cards with one get_many() and renders only the missing ones.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = "moviesite/_movie_card.html"
+KEY_PREFIX = "movie_card"
+
+
+def _cache():
+    return caches[getattr(settings, "FRAGMENT_CACHE", "default")]
+
+
+def card_key(movie, staff=False):
+    author = movie.author.username if movie.author_id else ""
+    stamp = f"{movie.updated.timestamp() if movie.updated else 0}|{author}"
+    version = hashlib.md5(stamp.encode()).hexdigest()[:12]
+    return f"{KEY_PREFIX}:{movie.pk}:{version}:{'staff' if staff else 'public'}"
+
+
+def render_movie_cards(movies, staff=False, using=None):
+    cache = _cache()
+    keys = {card_key(movie, staff): movie for movie in movies}
+    found = cache.get_many(keys)
+    template = None
+    rendered = {}
+    for key, movie in keys.items():
+        if key not in found:
+            # Both engines render identical cards, so they share fragments.
+            template = template or get_template(CARD_TEMPLATE, using=using)
+            rendered[key] = template.render({"movie": movie, "staff": staff})
+    if rendered:
+        cache.set_many(rendered, getattr(settings, "FRAGMENT_CACHE_TIMEOUT", 60 * 60 * 24))
+    return mark_safe("".join(found.get(key) or rendered[key] for key in keys))
+
+
+def invalidate_movie_card(movie):
+    """Drop a movie's cards when they change without the movie being saved."""
+    _cache().delete_many([card_key(movie, staff) for staff in (False, True)])
@@ -0,0 +1,83 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+DERIVATIVE_DIR = "derivatives"
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+
+def derivative_widths():
+    return sorted(getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", (160, 320, 640, 960)))
+
+
+def derivative_formats():
+    formats = getattr(settings, "IMAGE_DERIVATIVE_FORMATS", ("avif", "webp"))
+    return [fmt for fmt in formats if features.check(fmt)]
+
+
+def derivative_name(name, width, fmt):
+    stem = os.path.splitext(name)[0]
+    return f"{DERIVATIVE_DIR}/{stem}/{width}.{fmt}"
+
+
+def generate_derivatives(field_file):
+    """Write resized WebP/AVIF copies of an uploaded image to storage.
+
+    Existing derivatives of the same original are overwritten. Images are
+    never upscaled: widths above the original keep the original size.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, "rb") as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    names = []
+    for width in derivative_widths():
+        resized = image.copy()
+        resized.thumbnail((width, width * 10), Image.LANCZOS)
+        for fmt in derivative_formats():
+            buffer = BytesIO()
+            resized.save(buffer, format=fmt.upper(), quality=80)
+            name = derivative_name(field_file.name, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+            names.append(name)
+    return names
+
+
+def has_derivatives(field_file):
+    formats = derivative_formats()
+    if not field_file or not formats:
+        return False
+    name = derivative_name(field_file.name, derivative_widths()[0], formats[-1])
+    return field_file.storage.exists(name)
+
+
+def delete_derivatives(storage, name):
+    for width in derivative_widths():
+        for fmt in MIME_TYPES:
+            derivative = derivative_name(name, width, fmt)
+            if storage.exists(derivative):
+                storage.delete(derivative)
+
+
+def srcset(field_file, fmt):
+    storage = field_file.storage
+    return ", ".join(
+        f"{storage.url(derivative_name(field_file.name, width, fmt))} {width}w"
+        for width in derivative_widths()
+    )
+
+
+def thumbnail_url(field_file):
+    """URL of the smallest derivative, or of the original if there is none."""
+    if has_derivatives(field_file):
+        fmt = derivative_formats()[-1]
+        return field_file.storage.url(derivative_name(field_file.name, derivative_widths()[0], fmt))
+    return field_file.url
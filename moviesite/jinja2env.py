@@ -0,0 +1,56 @@
+"""Jinja2 environment for the public pages (PUBLIC_TEMPLATE_ENGINE = 'jinja2').
+
+The globals and filters stand in for the Django tags and filters the
+Django versions of these templates use, so both render the same HTML.
+The backend itself adds ``csrf_input``/``csrf_token`` and runs the
+context processors, which provide ``messages``.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.templatetags.static import static
+from django.template.defaultfilters import date, truncatewords
+from django.urls import reverse
+from django.utils.formats import localize
+from jinja2 import Environment, Undefined, pass_context
+
+from .fragments import render_movie_cards
+from .staticfiles import vendor_url
+from .templatetags.images import responsive_image
+
+
+def url(name, *args, **kwargs):
+    return reverse(name, args=args or None, kwargs=kwargs or None)
+
+
+def profile_url(user):
+    # Django templates print "" for a missing author or profile.
+    try:
+        return user.profile.get_absolute_url() if user else ""
+    except ObjectDoesNotExist:
+        return ""
+
+
+@pass_context
+def movie_cards(context, movies):
+    user = context.get("user")
+    return render_movie_cards(movies, staff=bool(user and user.is_staff), using="jinja2")
+
+
+def environment(**options):
+    # Django picks DebugUndefined when DEBUG is on; missing variables must
+    # print "" like they do in Django templates.
+    options["undefined"] = Undefined
+    env = Environment(**options)
+    env.globals.update({
+        "url": url,
+        "static": static,
+        "profile_url": profile_url,
+        "movie_cards": movie_cards,
+        "responsive_image": responsive_image,
+        "vendor_asset": vendor_url,
+    })
+    env.filters.update({
+        "date": date,
+        "localize": localize,
+        "truncatewords": truncatewords,
+    })
+    return env
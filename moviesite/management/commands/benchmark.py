@@ -0,0 +1,156 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesite.benchmark import (
+    DEEP_PAGE, SEARCH_TERMS, admin_cookie, build_routes, compare, find_video_url, run_cards, run_pagination,
+    run_route, run_search, run_slow_clients,
+)
+from moviesite.models import Comment, Genre, Movie
+
+
+def page_numbers(value):
+    return [int(number) for number in value.split(",") if number.strip()]
+
+
+def search_terms(value):
+    return [term.strip() for term in value.split(",") if term.strip()]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the main pages and report latency percentiles, queries per request and RSS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("routes", nargs="*",
+                            help="Routes to run: main, main_deep, genre, movie, profile, search, admin_movies "
+                                 "and their JSON counterparts api_movies, api_genre, api_movie, api_profile.")
+        parser.add_argument("--mode", choices=["client", "wsgi"], default="client",
+                            help="Django test client, or direct WSGI calls from --concurrency threads.")
+        parser.add_argument("--requests", type=int, default=200, help="Measured requests per route.")
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per thread.")
+        parser.add_argument("--admin-user", help="Superuser for the admin route; defaults to the first one.")
+        parser.add_argument("--cards", type=int, default=60,
+                            help="Also time rendering a listing of N movie cards; 0 skips it.")
+        parser.add_argument("--deep-page", type=int, default=DEEP_PAGE,
+                            help="Listing page for the main_deep route (or the last pages, if fewer).")
+        parser.add_argument("--pages", type=page_numbers, default=[1, 10, 100, 1000, DEEP_PAGE],
+                            help="Comma-separated listing pages to time get_page() at; empty skips it.")
+        parser.add_argument("--search", type=search_terms, default=list(SEARCH_TERMS),
+                            help="Comma-separated terms to time FTS and icontains search with; empty skips it.")
+        parser.add_argument("--slow-clients", type=int, default=0,
+                            help="Also time pages while N slow clients download a video (ASGI with ASYNC_VIEWS).")
+        parser.add_argument("--read-delay", type=float, default=0.05,
+                            help="Seconds a slow client takes per 64 KiB chunk.")
+        parser.add_argument("--workers", type=int, default=8, help="WSGI threads for the slow-client run.")
+        parser.add_argument("--output", "-o",
+                            help="Write the results as JSON to this file, e.g. benchmarks/baseline.json.")
+        parser.add_argument("--baseline", help="Compare against a saved JSON result and fail on regressions.")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed latency growth (0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+        routes = build_routes(deep_page=options["deep_page"])
+        unknown = set(options["routes"]) - routes.keys()
+        if unknown:
+            raise CommandError(f"Unknown or empty routes: {', '.join(sorted(unknown))}. Run seed_catalog first?")
+        names = options["routes"] or list(routes)
+
+        cookie = admin_cookie(options["admin_user"]) if "admin_movies" in names else None
+        if "admin_movies" in names and cookie is None:
+            self.stderr.write(self.style.WARNING("No superuser found, skipping admin_movies."))
+            names.remove("admin_movies")
+
+        results = {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "catalog": {
+                "genres": Genre.objects.count(),
+                "movies": Movie.objects.count(),
+                "users": User.objects.count(),
+                "comments": Comment.objects.count(),
+            },
+            "mode": options["mode"],
+            "concurrency": options["concurrency"],
+            "routes": {},
+        }
+        self.stdout.write(f"{'route':<14}{'reqs':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'queries':>9}{'rss MiB':>9}")
+        for name in names:
+            stats = run_route(
+                routes[name],
+                options["requests"],
+                mode=options["mode"],
+                concurrency=options["concurrency"],
+                warmup=options["warmup"],
+                cookie=cookie if name == "admin_movies" else None,
+            )
+            results["routes"][name] = stats
+            self.stdout.write(
+                f"{name:<14}{stats['requests']:>6}{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+                f"{stats['requests_per_s']:>9}{stats['queries_per_request']:>9}{stats['rss_kib'] / 1024:>9.1f}"
+            )
+            if stats["errors"]:
+                self.stderr.write(self.style.WARNING(f"{name}: {stats['errors']} responses with status >= 400"))
+
+        if options["cards"]:
+            stats = run_cards(options["cards"], max(10, options["requests"] // 10))
+            results["cards"] = stats
+            self.stdout.write(
+                f"{stats['cards']} cards: {stats['cold_p50_ms']} ms p50 rendering every card, "
+                f"{stats['warm_p50_ms']} ms p50 from cached fragments"
+            )
+
+        if options["pages"]:
+            stats = run_pagination(options["pages"], max(10, options["requests"] // 10))
+            results["pagination"] = stats
+            self.stdout.write("get_page() p50: " + ", ".join(
+                f"page {key.split('_')[1]} {value} ms" for key, value in stats.items()
+            ))
+
+        if options["search"]:
+            stats = run_search(options["search"], max(5, options["requests"] // 20))
+            results["search"] = stats
+            self.stdout.write(f"search over {stats['movies']} movies, p50: " + ", ".join(
+                f"{term!r} " + " / ".join(
+                    f"{engine} {stats[f'{term}_{engine}_p50_ms']} ms"
+                    for engine in ("fts", "like") if f"{term}_{engine}_p50_ms" in stats
+                ) for term in options["search"]
+            ))
+
+        if options["slow_clients"]:
+            video_url = find_video_url()
+            if video_url is None:
+                self.stderr.write(self.style.WARNING("No movie has a video, skipping the slow-client run."))
+            else:
+                stats = run_slow_clients(
+                    video_url, routes["main"] + routes.get("movie", []), options["slow_clients"],
+                    options["requests"], options["read_delay"], options["workers"],
+                )
+                results["slow_clients"] = stats
+                self.stdout.write(
+                    f"{stats['clients']} slow clients, {stats['server']}: pages {stats['page_p50_ms']} ms p50, "
+                    f"{stats['page_p95_ms']} ms p95; {stats['downloads']} downloads, {stats['download_mean_s']} s each"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write("\n")
+            self.stdout.write(f"Results written to {options['output']}.")
+
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read baseline: {e}")
+            regressions = compare(baseline, results, options["tolerance"])
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,71 @@
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+from moviesite import async_views
+from moviesite.middleware import InlineHooksMixin
+
+ASYNC_VIEWS = ("movie_list", "MoviesByGenre", "MovieDetail", "ProfileDetail", "movie_video")
+# The handler calls these itself and sends sync ones to a thread.
+HANDLER_HOOKS = ("process_view", "process_template_response", "process_exception")
+
+
+async def _get_response(request):
+    pass
+
+
+def thread_hooks(middleware):
+    """Hooks of an async-mode ``middleware`` instance that run in a thread."""
+    hooks = []
+    if isinstance(middleware, InlineHooksMixin):
+        threaded = not middleware.inline
+    else:
+        threaded = isinstance(middleware, MiddlewareMixin) and type(middleware).__acall__ is MiddlewareMixin.__acall__
+    if threaded:
+        hooks += [name for name in ("process_request", "process_response") if hasattr(middleware, name)]
+    hooks += [
+        name for name in HANDLER_HOOKS
+        if hasattr(middleware, name) and not iscoroutinefunction(getattr(middleware, name))
+    ]
+    return hooks
+
+
+class Command(BaseCommand):
+    help = "List the middleware hooks that make an ASGI request switch threads."
+
+    def handle(self, *args, **options):
+        sync_only = []
+        for path in settings.MIDDLEWARE:
+            middleware_class = import_string(path)
+            if not getattr(middleware_class, "async_capable", False):
+                sync_only.append(path)
+                self.stdout.write(self.style.ERROR(f"{path}: sync only, everything after it runs in a thread"))
+                continue
+            try:
+                middleware = middleware_class(_get_response)
+            except MiddlewareNotUsed:
+                continue
+            hooks = thread_hooks(middleware)
+            if hooks:
+                self.stdout.write(self.style.WARNING(f"{path}: {', '.join(hooks)} in a thread"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{path}: async"))
+
+        for name in ASYNC_VIEWS:
+            view = getattr(async_views, name)
+            if not (view.view_is_async if hasattr(view, "view_is_async") else iscoroutinefunction(view)):
+                raise CommandError(f"async_views.{name} is not async.")
+        if not settings.ASYNC_VIEWS:
+            self.stdout.write(self.style.WARNING("ASYNC_VIEWS is off; the public pages use the sync views."))
+        for alias, database in settings.DATABASES.items():
+            if database.get("CONN_MAX_AGE", 0):
+                self.stdout.write(self.style.WARNING(
+                    f"DATABASES[{alias!r}]: CONN_MAX_AGE is {database['CONN_MAX_AGE']}; "
+                    "under ASGI persistent connections leak, set it to 0."
+                ))
+
+        if sync_only:
+            raise CommandError(f"{len(sync_only)} sync-only middleware on the ASGI path.")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesite.queryplans import HOT_QUERIES, check_plans
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the site's hot queries and fail if any of them scans a whole table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help=f"Queries to check: {', '.join(HOT_QUERIES)}.")
+        parser.add_argument("--show-plans", action="store_true", help="Print every plan, not just failures.")
+
+    def handle(self, *args, **options):
+        unknown = set(options["names"]) - HOT_QUERIES.keys()
+        if unknown:
+            raise CommandError(f"Unknown queries: {', '.join(sorted(unknown))}")
+
+        checked = failed = 0
+        for name, sql, plan, problems in check_plans(options["names"]):
+            checked += 1
+            if problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"{name}: {', '.join(problems)}"))
+            elif options["show_plans"]:
+                self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+            if problems or options["show_plans"]:
+                self.stdout.write(f"  {sql}")
+                for line in plan:
+                    self.stdout.write(f"    {line}")
+
+        if failed:
+            raise CommandError(f"{failed} of {checked} queries have a bad plan.")
+        self.stdout.write(self.style.SUCCESS(f"All {checked} queries use indexes."))
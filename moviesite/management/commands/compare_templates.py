@@ -0,0 +1,104 @@
+import difflib
+import re
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import INFO
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.test import RequestFactory
+
+from moviesite.benchmark import percentile
+from moviesite.fragments import card_key
+from moviesite.models import Movie
+from moviesite.pagination import CursorPaginator
+from moviesite.sidebar import get_genre_sidebar
+from moviesite.views import MOVIES_PER_PAGE
+
+ENGINES = ("django", "jinja2")
+# markupsafe and Django spell escaped quotes differently.
+ENTITIES = {"&#39;": "&#x27;", "&#34;": "&quot;"}
+
+
+def normalize(html):
+    """Drop whitespace and entity spelling differences between the engines' output."""
+    for entity, django_entity in ENTITIES.items():
+        html = html.replace(entity, django_entity)
+    return re.sub(r"\s+", " ", re.sub(r">\s+<", "><", html)).strip()
+
+
+class Command(BaseCommand):
+    help = "Render the public templates with both engines, compare the HTML and time them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=200, help="Timed renders per template and engine.")
+        parser.add_argument("--warm-cards", action="store_true", help="Keep cached movie cards between renders.")
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.filter(published=True).select_related("genre", "author__profile")
+        page_obj = CursorPaginator(movies, MOVIES_PER_PAGE).get_page(None)
+        movie = movies.first()
+        if movie is None:
+            raise CommandError("No published movies to render.")
+
+        cases = {
+            "main": ("moviesite/main.html", {
+                "genres": get_genre_sidebar(),
+                "movies": page_obj.object_list,
+                "page_obj": page_obj,
+            }),
+            "movie": ("moviesite/movie.html", {"movie": movie}),
+            "pagination": ("moviesite/pagination.html", {"page_obj": page_obj}),
+        }
+        cards = [card_key(m, staff) for m in page_obj.object_list for staff in (False, True)]
+        fragments = caches[getattr(settings, "FRAGMENT_CACHE", "default")]
+
+        def render(engine, name, context):
+            request = RequestFactory().get("/")
+            request.user = AnonymousUser()
+            request._messages = CookieStorage(request)
+            request._messages.add(INFO, "Xabar")
+            template = engines[engine].get_template(name)
+            return template.render(context, request)
+
+        mismatched = []
+        for case, (name, context) in cases.items():
+            output = {}
+            for engine in ENGINES:
+                # Each engine renders its own cards rather than the other's cached ones.
+                fragments.delete_many(cards)
+                output[engine] = normalize(render(engine, name, context))
+            if output["django"] != output["jinja2"]:
+                mismatched.append(case)
+                self.stdout.write(self.style.ERROR(f"{case}: output differs"))
+                diff = difflib.unified_diff(
+                    output["django"].replace("><", ">\n<").splitlines(),
+                    output["jinja2"].replace("><", ">\n<").splitlines(),
+                    "django", "jinja2", lineterm="",
+                )
+                for line in diff:
+                    self.stdout.write(f"  {line}")
+                continue
+
+            timings = {}
+            for engine in ENGINES:
+                samples = []
+                for _ in range(options["rounds"]):
+                    if not options["warm_cards"]:
+                        fragments.delete_many(cards)
+                    started = time.perf_counter()
+                    render(engine, name, context)
+                    samples.append(time.perf_counter() - started)
+                timings[engine] = samples
+            self.stdout.write(self.style.SUCCESS(f"{case}: identical"))
+            for engine, samples in timings.items():
+                self.stdout.write(
+                    f"  {engine:7} p50 {percentile(samples, 50) * 1000:.2f} ms, "
+                    f"{len(samples) / sum(samples):.0f} renders/s"
+                )
+
+        if mismatched:
+            raise CommandError(f"Templates differ between engines: {', '.join(mismatched)}")
@@ -0,0 +1,53 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesite.export import COMMENT_COLUMNS, MOVIE_COLUMNS, comment_rows, export_lines, movie_rows
+from moviesite.models import Comment, Movie
+
+
+class Command(BaseCommand):
+    help = "Stream movies or comments to CSV/JSONL, with the same filters as the movie admin."
+
+    def add_arguments(self, parser):
+        parser.add_argument("what", choices=["movies", "comments"])
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--output", "-o", help="File to write; defaults to stdout.")
+        parser.add_argument("--genre", type=int, help="Genre id (like the admin genre filter).")
+        parser.add_argument("--release-from", type=date.fromisoformat, help="YYYY-MM-DD, inclusive.")
+        parser.add_argument("--release-to", type=date.fromisoformat, help="YYYY-MM-DD, inclusive.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.all()
+        if options["genre"]:
+            movies = movies.filter(genre_id=options["genre"])
+        if options["release_from"]:
+            movies = movies.filter(release__gte=options["release_from"])
+        if options["release_to"]:
+            movies = movies.filter(release__lte=options["release_to"])
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        if options["what"] == "movies":
+            columns, rows = MOVIE_COLUMNS, movie_rows(movies, options["chunk_size"])
+        else:
+            comments = Comment.objects.all()
+            if movies.query.where:
+                comments = comments.filter(movie__in=movies.values("pk"))
+            columns, rows = COMMENT_COLUMNS, comment_rows(comments, options["chunk_size"])
+
+        out = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else None
+        count = -1 if options["format"] == "csv" else 0
+        try:
+            for line in export_lines(options["format"], columns, rows):
+                if out:
+                    out.write(line)
+                else:
+                    self.stdout.write(line, ending="")
+                count += 1
+        finally:
+            if out:
+                out.close()
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"{count} rows written to {options['output']}."))
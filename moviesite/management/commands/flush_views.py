@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesite.counters import buffer_is_shared, flush_views
+
+
+class Command(BaseCommand):
+    help = "Write buffered movie views to the database."
+
+    def handle(self, *args, **options):
+        if not buffer_is_shared():
+            raise CommandError(
+                f"The {getattr(settings, 'VIEW_COUNTER_CACHE', 'default')!r} cache is local to each process, so this command "
+                "cannot see the web processes' buffers; they flush themselves. Use Redis or Memcached."
+            )
+        written = flush_views()
+        self.stdout.write(self.style.SUCCESS(f"{written} views flushed."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from moviesite.images import generate_derivatives
+from moviesite.models import Movie, UserProfile
+
+
+class Command(BaseCommand):
+    help = "Generate resized cover and avatar images for existing uploads."
+
+    def handle(self, *args, **options):
+        files = [
+            movie.cover for movie in Movie.objects.exclude(cover="").exclude(cover=None).only("id", "cover")
+        ] + [
+            profile.avatar for profile in UserProfile.objects.exclude(avatar="").exclude(avatar=None).only("id", "avatar")
+        ]
+        for field_file in files:
+            try:
+                generate_derivatives(field_file)
+            except OSError as e:
+                self.stderr.write(f"{field_file.name}: {e}")
+                continue
+            self.stdout.write(field_file.name)
+        self.stdout.write(self.style.SUCCESS(f"{len(files)} images processed."))
@@ -0,0 +1,174 @@
+import csv
+import json
+import sys
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from moviesite.conditional import bump_catalog_version
+from moviesite.models import Genre, Movie
+from moviesite.pagecache import purge_tags
+from moviesite.search import fts_available, rebuild_index
+from moviesite.sidebar import invalidate_genre_sidebar
+
+UPDATE_FIELDS = ["director", "description", "genre", "release", "published", "updated"]
+TRUE_VALUES = {"1", "true", "yes", "ha", "y"}
+
+
+class RowError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Import or update movies from a CSV or JSONL feed, upserting on title."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file, or - for stdin.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Validate only, write nothing.")
+        parser.add_argument("--errors", help="Write rejected rows to this CSV file.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        batch_size = options["batch_size"]
+        self.dry_run = options["dry_run"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        self.genres = {name.lower(): pk for pk, name in Genre.objects.values_list("id", "type")}
+        self.new_genres = 0
+        error_file = open(options["errors"], "w", newline="", encoding="utf-8") if options["errors"] else None
+        self.error_writer = csv.writer(error_file) if error_file else None
+        if self.error_writer:
+            self.error_writer.writerow(["line", "error", "row"])
+
+        source = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        started = time.monotonic()
+        processed = imported = errors = 0
+        batch = {}
+        try:
+            for line, row in self.read_rows(source, fmt):
+                processed += 1
+                try:
+                    movie = self.build_movie(row)
+                except RowError as e:
+                    errors += 1
+                    self.report_error(line, e, row)
+                    continue
+                # The last row wins when a title repeats inside one batch.
+                batch[movie.title] = movie
+                if len(batch) >= batch_size:
+                    imported += self.save_batch(batch)
+                    batch = {}
+                    self.progress(processed, imported, errors, started)
+            if batch:
+                imported += self.save_batch(batch)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if error_file:
+                error_file.close()
+
+        self.progress(processed, imported, errors, started)
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING("Dry run: nothing was written."))
+            return
+
+        if imported:
+            self.refresh_caches()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {imported} movies imported, {self.new_genres} new genres, {errors} rows rejected."
+        ))
+
+    def read_rows(self, source, fmt):
+        if fmt == "csv":
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, text in enumerate(source, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as e:
+                row = {"_raw": text.strip(), "_error": f"invalid JSON: {e}"}
+            yield line, row
+
+    def build_movie(self, row):
+        if not isinstance(row, dict):
+            raise RowError("row must be an object")
+        if "_error" in row:
+            raise RowError(row["_error"])
+
+        title = str(row.get("title") or "").strip()
+        if not title:
+            raise RowError("title is required")
+        if len(title) > Movie._meta.get_field("title").max_length:
+            raise RowError("title is too long")
+
+        try:
+            release = date.fromisoformat(str(row.get("release") or "").strip())
+        except ValueError:
+            raise RowError("release must be YYYY-MM-DD")
+
+        published = row.get("published", True)
+        if isinstance(published, str):
+            published = published.strip().lower() in TRUE_VALUES if published.strip() else True
+
+        return Movie(
+            title=title,
+            director=str(row.get("director") or "").strip()[:100] or None,
+            description=str(row.get("description") or "").strip() or None,
+            genre_id=self.genre_id(row.get("genre")),
+            release=release,
+            published=bool(published),
+        )
+
+    def genre_id(self, name):
+        name = str(name or "").strip()
+        if not name:
+            raise RowError("genre is required")
+        if len(name) > Genre._meta.get_field("type").max_length:
+            raise RowError("genre is too long")
+        key = name.lower()
+        if key not in self.genres:
+            self.new_genres += 1
+            # Dry runs count new genres without creating them.
+            self.genres[key] = -self.new_genres if self.dry_run else Genre.objects.create(type=name).pk
+        return self.genres[key]
+
+    def save_batch(self, batch):
+        if self.dry_run:
+            return len(batch)
+        with transaction.atomic():
+            movies = Movie.objects.bulk_create(
+                batch.values(),
+                update_conflicts=True,
+                unique_fields=["title"],
+                update_fields=UPDATE_FIELDS,
+            )
+        # Primary keys come back where the database supports RETURNING.
+        purge_tags(*[f"movie:{movie.pk}" for movie in movies if movie.pk])
+        return len(batch)
+
+    def report_error(self, line, error, row):
+        if self.error_writer:
+            self.error_writer.writerow([line, str(error), json.dumps(row, ensure_ascii=False, default=str)])
+
+    def progress(self, processed, imported, errors, started):
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(f"{processed} rows, {imported} imported, {errors} rejected ({rate:.0f} rows/s)")
+
+    def refresh_caches(self):
+        # bulk_create sends no signals, so do their work once here.
+        invalidate_genre_sidebar()
+        bump_catalog_version()
+        purge_tags("movies", "genres")
+        if fts_available():
+            rebuild_index()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from moviesite.pagecache import page_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show the anonymous page cache hit/miss ratio."
+
+    def handle(self, *args, **options):
+        stats = page_cache_stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  "
+            f"ratio: {stats['ratio']:.2%}"
+        )
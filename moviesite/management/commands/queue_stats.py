@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from moviesite.taskqueue import queue_stats
+
+
+class Command(BaseCommand):
+    help = "Show task queue depth and latency for the last hour."
+
+    def handle(self, *args, **options):
+        stats = queue_stats()
+        for status, count in stats["depth"].items():
+            self.stdout.write(f"{status}: {count}")
+        self.stdout.write(f"finished in the last hour: {stats['finished']}")
+        for name, seconds in stats["latency"].items():
+            value = f"{seconds:.3f}s" if seconds is not None else "-"
+            self.stdout.write(f"avg {name} latency: {value}")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesite.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Refill the movies_fts full-text index from the movies table."
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError("Full-text index is only used on SQLite.")
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"{count} movies indexed."))
@@ -0,0 +1,65 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from moviesite.taskqueue import claim, execute
+from moviesite.tasks import schedule_session_cleanup
+
+
+def _init_process():
+    # Children must not share the parent's database connections.
+    import django
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run background tasks from the tasks table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=2)
+        parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        if options["mode"] == "process":
+            connections.close_all()
+            executor = ProcessPoolExecutor(concurrency, initializer=_init_process)
+        else:
+            executor = ThreadPoolExecutor(concurrency)
+
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f"Worker {worker_id}: concurrency={concurrency}, mode={options['mode']}")
+        schedule_session_cleanup()
+
+        pending = set()
+        with executor:
+            while self.running:
+                free = concurrency - len(pending)
+                claimed = claim(worker_id, free) if free else []
+                for pk in claimed:
+                    pending.add(executor.submit(execute, pk, worker_id))
+
+                if not pending:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+                done, pending = wait(pending, timeout=options["poll_interval"], return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            wait(pending)
+        self.stdout.write("Worker stopped.")
+
+    def stop(self, signum, frame):
+        self.running = False
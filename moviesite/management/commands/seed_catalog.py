@@ -0,0 +1,139 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from moviesite.conditional import bump_catalog_version
+from moviesite.models import Comment, Genre, Movie, UserProfile
+from moviesite.pagecache import purge_tags
+from moviesite.search import fts_available, rebuild_index
+from moviesite.sidebar import invalidate_genre_sidebar
+
+WORDS = (
+    "qora oq tun kun yulduz shamol daryo tog' sahro shahar sir yo'l oxirgi birinchi "
+    "katta kichik oltin temir olov muz sevgi urush tinchlik qasos orzu xotira soya nur "
+    "dark night city river storm empire ghost silent last lost broken golden iron"
+).split()
+GENRES = (
+    "Drama Komediya Jangari Triller Fantastika Sarguzasht Melodrama Detektiv Qo'rqinchli "
+    "Multfilm Hujjatli Tarixiy Biografik Musiqiy Sport Oilaviy Kriminal Vestern Harbiy Anime"
+).split()
+SEED_PASSWORD = "seedpass123"
+# Release dates count back from a fixed day so every run is identical.
+ANCHOR_DATE = date(2025, 1, 1)
+
+
+def zipf_weights(n, s=1.1):
+    """Popularity weights: the first items get most of the traffic."""
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a deterministic synthetic catalog for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--genres", type=int, default=20)
+        parser.add_argument("--movies", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--comments", type=int, default=50000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if min(options["genres"], options["movies"], options["users"]) < 1 or options["comments"] < 0:
+            raise CommandError("Counts must be positive.")
+        if Movie.objects.filter(title__startswith="Seed ").exists():
+            raise CommandError("The database already has a seeded catalog.")
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.monotonic()
+
+        genres = self.seed_genres(options["genres"])
+        users = self.seed_users(options["users"])
+        movies = self.seed_movies(options["movies"], genres, users)
+        comments = self.seed_comments(options["comments"], movies, users)
+
+        invalidate_genre_sidebar()
+        bump_catalog_version()
+        purge_tags("movies", "genres")
+        if fts_available():
+            rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(genres)} genres, {len(users)} users, {len(movies)} movies and "
+            f"{comments} comments in {time.monotonic() - started:.1f}s. "
+            f"Users log in with password {SEED_PASSWORD!r}."
+        ))
+
+    def bulk(self, model, objects):
+        with transaction.atomic():
+            return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def seed_genres(self, count):
+        names = [GENRES[i] if i < len(GENRES) else f"{GENRES[i % len(GENRES)]} {i // len(GENRES) + 1}" for i in range(count)]
+        existing = set(Genre.objects.values_list("type", flat=True))
+        self.bulk(Genre, [Genre(type=name) for name in names if name not in existing])
+        return list(Genre.objects.filter(type__in=names).order_by("id").values_list("id", flat=True))
+
+    def seed_users(self, count):
+        # Hashing once keeps seeding fast; every seeded user shares the password.
+        password = make_password(SEED_PASSWORD)
+        self.bulk(User, [
+            User(username=f"seed_user_{i:06d}", email=f"seed_user_{i:06d}@example.com", password=password)
+            for i in range(count)
+        ])
+        users = list(User.objects.filter(username__startswith="seed_user_").order_by("id").values_list("id", flat=True))
+        self.bulk(UserProfile, [
+            UserProfile(user_id=pk, bio=self.sentence(8, 30) if self.rng.random() < 0.6 else None)
+            for pk in users
+        ])
+        return users
+
+    def seed_movies(self, count, genres, users):
+        genre_weights = zipf_weights(len(genres))
+        author_weights = zipf_weights(len(users), s=1.3)
+        movies = []
+        for i in range(count):
+            # Newer movies are more common, like a real catalog.
+            age = int(self.rng.expovariate(1 / 3000))
+            movies.append(Movie(
+                title=f"Seed {i:06d} {self.sentence(1, 4).title()}"[:75],
+                director=self.sentence(2, 2).title(),
+                description=self.sentence(20, 120),
+                genre_id=self.rng.choices(genres, genre_weights)[0],
+                release=ANCHOR_DATE - timedelta(days=min(age, 36500)),
+                views=int(self.rng.paretovariate(1.2) * 10),
+                published=self.rng.random() < 0.95,
+                author_id=self.rng.choices(users, author_weights)[0] if self.rng.random() < 0.8 else None,
+            ))
+            if len(movies) >= self.batch_size:
+                self.bulk(Movie, movies)
+                movies = []
+        self.bulk(Movie, movies)
+        return list(Movie.objects.filter(title__startswith="Seed ").order_by("id").values_list("id", flat=True))
+
+    def seed_comments(self, count, movies, users):
+        # A few movies get most of the comments.
+        popular = movies[:]
+        self.rng.shuffle(popular)
+        movie_weights = zipf_weights(len(popular))
+        user_weights = zipf_weights(len(users))
+        written = 0
+        while written < count:
+            size = min(self.batch_size, count - written)
+            movie_ids = self.rng.choices(popular, movie_weights, k=size)
+            user_ids = self.rng.choices(users, user_weights, k=size)
+            self.bulk(Comment, [
+                Comment(movie_id=movie_id, user_id=user_id, text=self.sentence(3, 40))
+                for movie_id, user_id in zip(movie_ids, user_ids)
+            ])
+            written += size
+            self.stdout.write(f"{written}/{count} comments")
+        return written
+
+    def sentence(self, low, high):
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(low, high))).capitalize()
@@ -0,0 +1,42 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesite.replica import replica_alias
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the replica file (local stand-in for replication)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="Keep copying every N seconds.")
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No replica configured; set REPLICA_DATABASE and add it to DATABASES.")
+        primary, replica = settings.DATABASES["default"], settings.DATABASES[alias]
+        if "sqlite3" not in primary["ENGINE"] or "sqlite3" not in replica["ENGINE"]:
+            raise CommandError("sync_replica only copies between SQLite files.")
+
+        interval = options["interval"]
+        while True:
+            started = time.monotonic()
+            self.copy(primary["NAME"], replica["NAME"])
+            self.stdout.write(f"Replica synced in {time.monotonic() - started:.2f}s.")
+            if not interval:
+                return
+            time.sleep(interval)
+
+    def copy(self, source_name, target_name):
+        # The backup API copies a consistent snapshot, even from a WAL
+        # database that is being written to.
+        source = sqlite3.connect(source_name)
+        target = sqlite3.connect(target_name)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,33 @@
+import os
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesite.staticfiles import VENDOR_ASSETS
+
+
+class Command(BaseCommand):
+    help = "Download the CDN assets into moviesite/static/vendor/ for VENDOR_ASSETS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Download files that are already there again.")
+
+    def handle(self, *args, **options):
+        directory = os.path.join(apps.get_app_config("moviesite").path, "static", "vendor")
+        os.makedirs(directory, exist_ok=True)
+        for name, url in VENDOR_ASSETS.items():
+            path = os.path.join(directory, name)
+            if os.path.exists(path) and not options["force"]:
+                self.stdout.write(f"{name}: already downloaded")
+                continue
+            try:
+                with urlopen(url, timeout=30) as response:
+                    data = response.read()
+            except URLError as e:
+                raise CommandError(f"{url}: {e}")
+            with open(path, "wb") as f:
+                f.write(data)
+            self.stdout.write(f"{name}: {len(data) // 1024} KiB")
+        self.stdout.write(self.style.SUCCESS("Set VENDOR_ASSETS = True and run collectstatic."))
@@ -0,0 +1,300 @@
+"""Per-route request metrics in Prometheus text format.
+
+``MetricsMiddleware`` observes wall time, SQL query count and time,
+template render time and response size for every request, labelled with
+the route name from ``moviesite.urls`` ("admin" and "other" for the rest).
+Observations go into a histogram buffer owned by the current thread,
+behind a lock only a flush ever contends for. Every
+``METRICS_FLUSH_INTERVAL`` seconds a thread adds its buffer to
+``METRICS_CACHE`` with incr(), and a scrape of /metrics first flushes the
+buffers of every thread in the process; with a shared cache the totals
+cover every worker process. /metrics also
+reports the task queue's depth and per-task latency, read from the
+database when scraped.
+"""
+import contextvars
+import threading
+import time
+from contextlib import ExitStack
+from functools import cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .taskqueue import latency_by_task, queue_stats
+
+KEY_PREFIX = "metrics"
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# name -> (help, bucket upper bounds, scale used to store the sum as an int)
+HISTOGRAMS = {
+    "request_duration_seconds": ("Wall time of the request.", SECONDS, 1_000_000),
+    "db_queries": ("SQL queries run by the request.", (0, 1, 2, 5, 10, 20, 50, 100), 1),
+    "db_duration_seconds": ("Time spent in SQL queries.", (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1), 1_000_000),
+    "template_render_seconds": ("Time spent rendering templates.", SECONDS, 1_000_000),
+    "response_size_bytes": ("Size of the response body.", (1024, 4096, 16384, 65536, 262144, 1048576, 4194304), 1),
+}
+
+_local = threading.local()
+# Every thread's buffer, so a scrape can flush threads that sit idle.
+_buffers = []
+_buffers_lock = threading.Lock()
+_render_time = contextvars.ContextVar("template_render_time", default=None)
+
+
+def _cache():
+    return caches[getattr(settings, "METRICS_CACHE", "default")]
+
+
+def _flush_interval():
+    return getattr(settings, "METRICS_FLUSH_INTERVAL", 10)
+
+
+def _key(metric, route, bucket):
+    return f"{KEY_PREFIX}:{metric}:{route}:{bucket}"
+
+
+@cache
+def route_names():
+    """Route labels: named patterns in moviesite.urls, then admin and other."""
+    from . import urls
+
+    names = []
+
+    def walk(patterns):
+        for pattern in patterns:
+            if hasattr(pattern, "url_patterns"):
+                if not pattern.namespace:
+                    walk(pattern.url_patterns)
+            elif pattern.name:
+                names.append(pattern.name)
+    walk(urls.urlpatterns)
+    return names + ["admin", "other"]
+
+
+def route_label(request):
+    match = request.resolver_match
+    if match is None:
+        return "other"
+    if "admin" in match.namespaces:
+        return "admin"
+    if not match.namespaces and match.url_name in route_names():
+        return match.url_name
+    return "other"
+
+
+class _Buffer:
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.flushed = time.monotonic()
+
+    def take(self):
+        with self.lock:
+            counts, self.counts, self.flushed = self.counts, {}, time.monotonic()
+        return counts
+
+
+def _buffer():
+    if not hasattr(_local, "buffer"):
+        _local.buffer = _Buffer()
+        with _buffers_lock:
+            _buffers.append(_local.buffer)
+    return _local.buffer
+
+
+def observe(metric, route, value):
+    _, buckets, scale = HISTOGRAMS[metric]
+    bucket = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+    buffer = _buffer()
+    with buffer.lock:
+        counts = buffer.counts
+        for key, amount in ((_key(metric, route, bucket), 1), (_key(metric, route, "sum"), round(value * scale))):
+            counts[key] = counts.get(key, 0) + amount
+
+
+def maybe_flush():
+    if time.monotonic() - _buffer().flushed >= _flush_interval():
+        flush()
+
+
+def flush():
+    """Add this thread's buffer to the shared totals."""
+    _add(_buffer().take())
+
+
+def flush_all():
+    """Flush every thread's buffer; buffers of finished threads are dropped."""
+    with _buffers_lock:
+        buffers = list(_buffers)
+    for buffer in buffers:
+        _add(buffer.take())
+        if not buffer.thread.is_alive():
+            with _buffers_lock:
+                _buffers.remove(buffer)
+
+
+def _add(counts):
+    cache = _cache()
+    for key, amount in counts.items():
+        if not amount:
+            continue
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # Evicted between add() and incr().
+            cache.add(key, amount, timeout=None)
+
+
+class TemplateTimer:
+    """Add the time of the outermost template render to the current request."""
+
+    def __enter__(self):
+        self.total = _render_time.get()
+        self.outermost = self.total is not None and not self.total[1]
+        if self.outermost:
+            self.total[1] = True
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.outermost:
+            self.total[0] += time.perf_counter() - self.started
+            self.total[1] = False
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _response_size(response):
+    if response.streaming:
+        return int(response["Content-Length"]) if response.has_header("Content-Length") else None
+    return len(response.content)
+
+
+class RequestMeasurement:
+    """Time a request and count its queries; ``record()`` observes the result."""
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = QueryTimer()
+        # [seconds, rendering now]; TemplateTimer updates it in place.
+        self.render = [0.0, False]
+
+    def __enter__(self):
+        self.token = _render_time.set(self.render)
+        self.stack = ExitStack()
+        for conn in connections.all():
+            self.stack.enter_context(conn.execute_wrapper(self.queries))
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+        self.stack.close()
+        _render_time.reset(self.token)
+
+    def record(self, response):
+        route = route_label(self.request)
+        observe("request_duration_seconds", route, self.elapsed)
+        observe("db_queries", route, self.queries.count)
+        observe("db_duration_seconds", route, self.queries.seconds)
+        observe("template_render_seconds", route, self.render[0])
+        size = _response_size(response)
+        if size is not None:
+            observe("response_size_bytes", route, size)
+        maybe_flush()
+        return response
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with RequestMeasurement(request) as measurement:
+            response = self.get_response(request)
+        return measurement.record(response)
+
+    async def __acall__(self, request):
+        with RequestMeasurement(request) as measurement:
+            response = await self.get_response(request)
+        return measurement.record(response)
+
+
+def render_metrics():
+    routes = route_names()
+    cache = _cache()
+    lines = []
+    for metric, (help_text, buckets, scale) in HISTOGRAMS.items():
+        keys = [_key(metric, route, bucket) for route in routes for bucket in [*range(len(buckets) + 1), "sum"]]
+        values = cache.get_many(keys)
+        name = f"moviesite_{metric}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for route in routes:
+            counts = [values.get(_key(metric, route, i), 0) for i in range(len(buckets) + 1)]
+            if not any(counts):
+                continue
+            total = 0
+            for bound, count in zip([*buckets, "+Inf"], counts):
+                total += count
+                lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {total}')
+            total_sum = values.get(_key(metric, route, "sum"), 0)
+            lines.append(f'{name}_sum{{route="{route}"}} {total_sum / scale if scale != 1 else total_sum}')
+            lines.append(f'{name}_count{{route="{route}"}} {total}')
+    lines += _queue_metrics()
+    return "\n".join(lines) + "\n"
+
+
+def _queue_metrics():
+    lines = [
+        "# HELP moviesite_task_queue_depth Tasks in the queue by status.",
+        "# TYPE moviesite_task_queue_depth gauge",
+    ]
+    for status, count in queue_stats()["depth"].items():
+        lines.append(f'moviesite_task_queue_depth{{status="{status}"}} {count}')
+    latency = latency_by_task()
+    lines += [
+        "# HELP moviesite_task_latency_seconds Average latency of tasks finished in the last hour.",
+        "# TYPE moviesite_task_latency_seconds gauge",
+    ]
+    for task, stats in latency.items():
+        for phase in ("wait", "run", "total"):
+            lines.append(f'moviesite_task_latency_seconds{{task="{task}",phase="{phase}"}} {stats[phase]}')
+    lines += [
+        "# HELP moviesite_task_finished Tasks finished in the last hour.",
+        "# TYPE moviesite_task_finished gauge",
+    ]
+    for task, stats in latency.items():
+        lines.append(f'moviesite_task_finished{{task="{task}"}} {stats["count"]}')
+    return lines
+
+
+def metrics_view(request):
+    allowed = getattr(settings, "METRICS_ALLOWED_IPS", None)
+    if allowed is not None and request.META.get("REMOTE_ADDR") not in allowed:
+        return HttpResponseForbidden()
+    flush_all()
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
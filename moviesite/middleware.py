@@ -0,0 +1,84 @@
+"""Django's stock middleware, with the hooks run in the event loop under ASGI.
+
+MiddlewareMixin calls process_request() and process_response() through
+sync_to_async, and all thread-sensitive calls share one thread, so
+concurrent ASGI requests queue behind each other's header checks. These
+subclasses call the hooks directly when all they touch is headers,
+cookies and in-memory state. Under WSGI they are the originals.
+"""
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.sessions import middleware as sessions
+from django.middleware import clickjacking, common, csrf, security
+from django.utils.module_loading import import_string
+
+
+class InlineHooksMixin:
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.inline = iscoroutinefunction(self) and self.can_inline()
+        if self.inline and hasattr(self, "process_view"):
+            # The handler sends a sync process_view() to a thread as well.
+            process_view = self.process_view
+
+            async def aprocess_view(request, view_func, view_args, view_kwargs):
+                return process_view(request, view_func, view_args, view_kwargs)
+            self.process_view = aprocess_view
+
+    def can_inline(self):
+        """False when a hook may do I/O with this configuration."""
+        return True
+
+    async def __acall__(self, request):
+        if not self.inline:
+            return await super().__acall__(request)
+        response = None
+        if hasattr(self, "process_request"):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, "process_response"):
+            response = self.process_response(request, response)
+        return response
+
+
+class SecurityMiddleware(InlineHooksMixin, security.SecurityMiddleware):
+    pass
+
+
+class CommonMiddleware(InlineHooksMixin, common.CommonMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(InlineHooksMixin, csrf.CsrfViewMiddleware):
+    def can_inline(self):
+        # The token would come from the session, which may query the database.
+        return not settings.CSRF_USE_SESSIONS
+
+
+class AuthenticationMiddleware(InlineHooksMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(InlineHooksMixin, messages.MessageMiddleware):
+    def can_inline(self):
+        # Session-backed storage may have to load the session.
+        return issubclass(import_string(settings.MESSAGE_STORAGE), CookieStorage)
+
+
+class XFrameOptionsMiddleware(InlineHooksMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
+
+
+class SessionMiddleware(sessions.SessionMiddleware):
+    """Only a session that has to be saved goes to a thread."""
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        response = await self.get_response(request)
+        session = request.session
+        if (session.modified or settings.SESSION_SAVE_EVERY_REQUEST) and not session.is_empty():
+            return await sync_to_async(self.process_response, thread_sensitive=True)(request, response)
+        return self.process_response(request, response)
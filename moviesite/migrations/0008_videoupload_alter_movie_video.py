@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:12
+
+import django.db.models.deletion
+import moviesite.validators
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesite', '0007_alter_movie_author_userprofile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movie',
+            name='video',
+            field=models.FileField(blank=True, null=True, upload_to='videos/', validators=[moviesite.validators.validate_video_content], verbose_name='Kinosi'),
+        ),
+        migrations.CreateModel(
+            name='VideoUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Fayl nomi')),
+                ('size', models.BigIntegerField(verbose_name='Hajmi')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Yuklangan')),
+                ('video', models.CharField(blank=True, max_length=255, verbose_name='Video fayl')),
+                ('completed', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Video upload',
+                'verbose_name_plural': 'Video uploads',
+                'db_table': 'video_uploads',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesite', '0010_movies_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name="O'zgartirilgan"),
+            preserve_default=False,
+        ),
+    ]
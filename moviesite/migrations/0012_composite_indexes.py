@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesite', '0011_movie_updated'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['movie', 'created'], name='comments_movie_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('published', True)), fields=['release', 'id'], name='movies_pub_release_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('published', True)), fields=['genre', 'release', 'id'], name='movies_genre_pub_release_idx'),
+        ),
+    ]
@@ -1,8 +1,11 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
-from django.core.validators import FileExtensionValidator
 from django.urls import reverse
 
+from .validators import validate_video_content
+
 
 class Genre(models.Model):
     type = models.CharField(verbose_name="Nomi", max_length=50)
@@ -23,11 +26,12 @@ class Movie(models.Model):
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='movies', verbose_name="Janri")
     cover = models.ImageField(verbose_name="Posteri", upload_to='covers/', null=True, blank=True)
     video = models.FileField(verbose_name="Kinosi", upload_to='videos/', null=True, blank=True,
-                             validators=[FileExtensionValidator(['mp4', 'mkv', 'avi'])])
+                             validators=[validate_video_content])
     release = models.DateField(verbose_name="Chiqgan sanasi")
     views = models.IntegerField(verbose_name="Ko'rishlar soni", default=0)
     published = models.BooleanField(verbose_name="Saytga chiqarish?", default=True)
     author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    updated = models.DateTimeField(verbose_name="O'zgartirilgan", auto_now=True)
 
     def __str__(self):
         return self.title
@@ -37,6 +41,14 @@ class Movie(models.Model):
         verbose_name = 'Movie'
         verbose_name_plural = 'Movies'
         db_table = 'movies'
+        indexes = [
+            # Keyset pages of published movies, newest first. Partial, since
+            # filter(published=True) compiles to a bare WHERE "published".
+            models.Index(fields=['release', 'id'], condition=models.Q(published=True),
+                         name='movies_pub_release_idx'),
+            models.Index(fields=['genre', 'release', 'id'], condition=models.Q(published=True),
+                         name='movies_genre_pub_release_idx'),
+        ]
 
 class Comment(models.Model):
     text = models.CharField(verbose_name="Matni", max_length=500)
@@ -52,6 +64,9 @@ class Comment(models.Model):
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
         db_table = 'comments'
+        indexes = [
+            models.Index(fields=['movie', 'created'], name='comments_movie_created_idx'),
+        ]
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
@@ -64,3 +79,72 @@ class UserProfile(models.Model):
     def get_absolute_url(self):
         return reverse("profile_detail", kwargs={"username": self.user.username})
 
+
+class VideoUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
+    filename = models.CharField(verbose_name="Fayl nomi", max_length=255)
+    size = models.BigIntegerField(verbose_name="Hajmi")
+    offset = models.BigIntegerField(verbose_name="Yuklangan", default=0)
+    video = models.CharField(verbose_name="Video fayl", max_length=255, blank=True)
+    completed = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.filename
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'Video upload'
+        verbose_name_plural = 'Video uploads'
+        db_table = 'video_uploads'
+
+
+class Task(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Navbatda'),
+        (RUNNING, 'Bajarilmoqda'),
+        (DONE, 'Bajarildi'),
+        (FAILED, 'Xatolik'),
+    ]
+
+    name = models.CharField(verbose_name="Vazifa", max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(verbose_name="Bajarish vaqti")
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+    class Meta:
+        ordering = ['run_at']
+        verbose_name = 'Task'
+        verbose_name_plural = 'Tasks'
+        db_table = 'tasks'
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='tasks_status_run_at_idx'),
+        ]
+
+
+class CatalogVersion(models.Model):
+    """One row whose version changes with every movie or genre change."""
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.version)
+
+    class Meta:
+        db_table = 'catalog_version'
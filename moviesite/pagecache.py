@@ -0,0 +1,196 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .replica import primary_reads
+
+KEY_PREFIX = "pagecache"
+HITS_KEY = f"{KEY_PREFIX}:hits"
+MISSES_KEY = f"{KEY_PREFIX}:misses"
+
+
+def _cache():
+    return caches[getattr(settings, "PAGE_CACHE", "default")]
+
+
+def _timeout():
+    return getattr(settings, "PAGE_CACHE_TIMEOUT", 300)
+
+
+def _page_key(request):
+    url = request.build_absolute_uri()
+    return f"{KEY_PREFIX}:page:{hashlib.md5(url.encode()).hexdigest()}"
+
+
+def _tag_key(tag):
+    return f"{KEY_PREFIX}:tag:{tag}"
+
+
+def add_cache_tags(request, *tags):
+    """Tag the page being built for ``request`` with surrogate keys."""
+    if not hasattr(request, "page_cache_tags"):
+        request.page_cache_tags = set()
+    request.page_cache_tags.update(tags)
+
+
+def purge_tags(*tags):
+    """Invalidate every cached page carrying one of ``tags``.
+
+    Each tag has a version number; cached pages remember the versions they
+    were built with, so bumping a version drops exactly the pages using it.
+    Other processes only see the bump if PAGE_CACHE is a shared backend.
+    """
+    cache = _cache()
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            # Never used, or evicted: any page built with it is gone too.
+            pass
+
+
+def _tag_versions(cache, tags):
+    keys = {_tag_key(tag): tag for tag in tags}
+    versions = {keys[k]: v for k, v in cache.get_many(keys).items()}
+    for tag in set(tags) - versions.keys():
+        # Start from a fresh number so an evicted tag can't bring
+        # back pages that were purged before the eviction.
+        cache.add(_tag_key(tag), time.time_ns(), timeout=None)
+        versions[tag] = cache.get(_tag_key(tag))
+    return versions
+
+
+def _cacheable(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def _count(key):
+    cache = _cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def page_cache_stats():
+    cache = _cache()
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "ratio": hits / total if total else 0.0,
+    }
+
+
+def _cached_response(cache, key):
+    entry = cache.get(key)
+    if entry is None or _tag_versions(cache, entry["tags"]) != entry["tags"]:
+        return None
+    _count(HITS_KEY)
+    response = HttpResponse(entry["content"], content_type=entry["content_type"])
+    response["X-Page-Cache"] = "hit"
+    return response
+
+
+def _store(request, cache, key, response):
+    if hasattr(response, "render") and not response.is_rendered:
+        response.render()
+
+    tags = getattr(request, "page_cache_tags", None)
+    if response.status_code == 200 and tags and not response.cookies and not len(get_messages(request)):
+        cache.set(key, {
+            "content": response.content,
+            "content_type": response["Content-Type"],
+            "tags": _tag_versions(cache, tags),
+        }, _timeout())
+    response["X-Page-Cache"] = "miss"
+    return response
+
+
+def serve_cached(request, get_response, on_hit=None):
+    if not _cacheable(request):
+        return get_response()
+
+    cache = _cache()
+    key = _page_key(request)
+    response = _cached_response(cache, key)
+    if response is not None:
+        if on_hit is not None:
+            on_hit()
+        return response
+
+    _count(MISSES_KEY)
+    # The entry outlives any replica lag, so build it from the primary.
+    with primary_reads():
+        return _store(request, cache, key, get_response())
+
+
+async def aserve_cached(request, get_response, on_hit=None):
+    """serve_cached() for async views; the callbacks return awaitables."""
+    if not _cacheable(request):
+        return await get_response()
+
+    cache = _cache()
+    key = _page_key(request)
+    response = _cached_response(cache, key)
+    if response is not None:
+        if on_hit is not None:
+            await on_hit()
+        return response
+
+    _count(MISSES_KEY)
+    with primary_reads():
+        return _store(request, cache, key, await get_response())
+
+
+def anonymous_page_cache(view):
+    """Serve a function view from the page cache for anonymous visitors.
+
+    Only responses whose view called add_cache_tags() are stored.
+    """
+    if iscoroutinefunction(view):
+        async def wrapper(request, *args, **kwargs):
+            return await aserve_cached(request, lambda: view(request, *args, **kwargs))
+    else:
+        def wrapper(request, *args, **kwargs):
+            return serve_cached(request, lambda: view(request, *args, **kwargs))
+    return wraps(view)(wrapper)
+
+
+class AnonymousPageCacheMixin:
+    """Class-based counterpart of anonymous_page_cache.
+
+    Async views override ``apage_cache_hit()`` instead of ``page_cache_hit()``.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return aserve_cached(
+                request,
+                lambda: super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs),
+                on_hit=lambda: self.apage_cache_hit(request, *args, **kwargs),
+            )
+        return serve_cached(
+            request,
+            lambda: super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs),
+            on_hit=lambda: self.page_cache_hit(request, *args, **kwargs),
+        )
+
+    def page_cache_hit(self, request, *args, **kwargs):
+        pass
+
+    async def apage_cache_hit(self, request, *args, **kwargs):
+        pass
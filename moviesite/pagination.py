@@ -0,0 +1,148 @@
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset paginator for querysets ordered descending by ``fields``.
+
+    Pages are addressed by an opaque cursor holding the key of the row next
+    to the page boundary, so there is no COUNT(*) and no OFFSET: every page
+    is an indexed range scan of ``per_page + 1`` rows.
+    The last field must be unique (the primary key) to break ties.
+    """
+
+    def __init__(self, queryset, per_page, fields=("release", "id")):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.fields = fields
+
+    def get_page(self, cursor=None):
+        for rows, build in self._plans(cursor):
+            page = build(list(rows))
+            if page is not None:
+                return page
+
+    async def aget_page(self, cursor=None):
+        for rows, build in self._plans(cursor):
+            page = build([obj async for obj in rows])
+            if page is not None:
+                return page
+
+    def cursor_for_page(self, number):
+        """Cursor of page ``number`` (from 1); None for the first page or past the end.
+
+        Found with an OFFSET scan, so it is for tests and benchmarks only.
+        """
+        if number <= 1:
+            return None
+        offset = (number - 1) * self.per_page - 1
+        rows = list(self.queryset.order_by(*[f"-{f}" for f in self.fields])[offset:offset + 1])
+        return self._cursor("n", rows[0]) if rows else None
+
+    def _plans(self, cursor):
+        """(rows to fetch, function making them a page or None), in the order to try."""
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is not None:
+            direction, values = position
+            yield self._before(values) if direction == "p" else self._after(values, has_previous=True)
+        # No cursor, a bad one, or nothing before it: the first page.
+        yield self._after(None, has_previous=False)
+
+    def _after(self, values, has_previous):
+        queryset = self.queryset.order_by(*[f"-{f}" for f in self.fields])
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, "lt"))
+
+        def build(rows):
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return CursorPage(
+                rows,
+                next_cursor=self._cursor("n", rows[-1]) if has_next else None,
+                previous_cursor=self._cursor("p", rows[0]) if has_previous and rows else None,
+            )
+        return queryset[:self.per_page + 1], build
+
+    def _before(self, values):
+        queryset = self.queryset.order_by(*self.fields).filter(self._seek(values, "gt"))
+
+        def build(rows):
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            if not rows:
+                return None
+            return CursorPage(
+                rows,
+                next_cursor=self._cursor("n", rows[-1]),
+                previous_cursor=self._cursor("p", rows[0]) if has_previous else None,
+            )
+        return queryset[:self.per_page + 1], build
+
+    def _seek(self, values, lookup):
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        conditions = []
+        for i, field in enumerate(self.fields):
+            equal = {f: v for f, v in zip(self.fields[:i], values[:i])}
+            conditions.append(Q(**equal, **{f"{field}__{lookup}": values[i]}))
+        # The redundant a <= x bounds the index range; the OR alone makes
+        # SQLite scan from the first row, so deep pages got slower.
+        return Q(**{f"{self.fields[0]}__{lookup}e": values[0]}) & reduce(lambda a, b: a | b, conditions)
+
+    def _cursor(self, direction, obj):
+        values = [getattr(obj, field) for field in self.fields]
+        payload = json.dumps([direction, [str(v) for v in values]], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in ("n", "p") or len(raw) != len(self.fields):
+                return None
+            opts = self.queryset.model._meta
+            values = [opts.get_field(f).to_python(v) for f, v in zip(self.fields, raw)]
+        except (TypeError, ValueError, ValidationError):
+            return None
+        return direction, values
+
+
+class CursorPaginationMixin:
+    """Use CursorPaginator in a ListView instead of Django's Paginator."""
+    cursor_fields = ("release", "id")
+    cursor_kwarg = "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.cursor_fields)
+        page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.cursor_fields)
+        page = await paginator.aget_page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,106 @@
+import logging
+from contextlib import ExitStack
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.test.utils import override_settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+def _check(name, budget, counter):
+    used = len(counter.queries)
+    if used <= budget:
+        return
+    message = f"{name} ran {used} queries, budget is {budget}"
+    if getattr(settings, "QUERY_BUDGET_STRICT", False):
+        raise QueryBudgetExceeded(message + ":\n" + "\n".join(counter.queries))
+    logger.warning(message)
+
+
+def _counting(counter):
+    stack = ExitStack()
+    # Count queries on every alias; reads may go to the replica.
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(counter))
+    return stack
+
+
+def _run(name, budget, view, *args, **kwargs):
+    counter = QueryCounter()
+    with _counting(counter):
+        response = view(*args, **kwargs)
+        # Template responses render lazily; count their queries too.
+        if hasattr(response, "render") and not response.is_rendered:
+            response.render()
+    _check(name, budget, counter)
+    return response
+
+
+async def _arun(name, budget, view, *args, **kwargs):
+    counter = QueryCounter()
+    with _counting(counter):
+        response = await view(*args, **kwargs)
+        if hasattr(response, "render") and not response.is_rendered:
+            response.render()
+    _check(name, budget, counter)
+    return response
+
+
+def query_budget(max_queries):
+    """Limit the number of SQL queries a function view may run."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            async def wrapper(request, *args, **kwargs):
+                return await _arun(view.__name__, max_queries, view, request, *args, **kwargs)
+        else:
+            def wrapper(request, *args, **kwargs):
+                return _run(view.__name__, max_queries, view, request, *args, **kwargs)
+        wrapper = wraps(view)(wrapper)
+        wrapper.max_queries = max_queries
+        return wrapper
+    return decorator
+
+
+class QueryBudgetMixin:
+    """Limit the number of SQL queries a class-based view may run."""
+    max_queries = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.max_queries is None:
+            return super().dispatch(request, *args, **kwargs)
+        run = _arun if self.view_is_async else _run
+        return run(type(self).__name__, self.max_queries, super().dispatch, request, *args, **kwargs)
+
+
+class QueryBudgetTestMixin:
+    """TestCase helper: fail when a page goes over its view's query budget.
+
+        class MainPageTests(QueryBudgetTestMixin, TestCase):
+            def test_main(self):
+                self.assertWithinQueryBudget(reverse("main"))
+    """
+
+    def assertWithinQueryBudget(self, url, client=None, **extra):
+        client = client or self.client
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            try:
+                response = client.get(url, **extra)
+            except QueryBudgetExceeded as e:
+                self.fail(str(e))
+        return response
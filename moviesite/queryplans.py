@@ -0,0 +1,108 @@
+"""Hot queries whose plans ``manage.py check_query_plans`` verifies.
+
+Each registered function runs one code path the site serves a lot. Its SQL
+is captured and EXPLAINed, and a plan that scans a whole table or sorts
+rows in a temporary structure counts as a failure. Keep these in step with
+the views when their querysets change.
+"""
+import re
+from datetime import date
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .models import Comment, Movie
+from .pagination import CursorPaginator
+
+HOT_QUERIES = {}
+
+PER_PAGE = 3
+SAMPLE_ID = 1
+
+SQLITE_PROBLEMS = [
+    (re.compile(r"^SCAN (TABLE )?(?P<table>\w+)(?! USING (COVERING )?INDEX)\s*$"), "full scan"),
+    (re.compile(r"USE TEMP B-TREE FOR (?P<table>ORDER BY)"), "sort"),
+]
+POSTGRES_PROBLEMS = [
+    (re.compile(r"Seq Scan on (?P<table>\w+)"), "full scan"),
+    (re.compile(r"(?P<table>)\bSort\b"), "sort"),
+]
+
+
+def hot_query(func):
+    HOT_QUERIES[func.__name__] = func
+    return func
+
+
+def _cursor(paginator, direction):
+    # A cursor pointing into the middle of the catalog.
+    return paginator._cursor(direction, Movie(pk=SAMPLE_ID, release=date.today()))
+
+
+def _listing_pages(queryset, fields=("release", "id")):
+    paginator = CursorPaginator(queryset, PER_PAGE, fields)
+    paginator.get_page(None)
+    paginator.get_page(_cursor(paginator, "n"))
+    paginator.get_page(_cursor(paginator, "p"))
+
+
+@hot_query
+def movie_list():
+    _listing_pages(Movie.objects.filter(published=True).select_related("genre", "author__profile"))
+
+
+@hot_query
+def movies_by_genre():
+    _listing_pages(
+        Movie.objects.filter(genre_id=SAMPLE_ID, published=True).select_related("genre", "author__profile")
+    )
+
+
+@hot_query
+def movie_comments():
+    paginator = CursorPaginator(Comment.objects.filter(movie_id=SAMPLE_ID).select_related("user"), 20, ("created", "id"))
+    paginator.get_page(None)
+
+
+@hot_query
+def admin_comment_inline():
+    comments = Comment.objects.filter(movie_id=SAMPLE_ID)
+    list(comments.values_list("pk", flat=True)[:21])
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f"EXPLAIN {sql}")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def problems(plan):
+    patterns = SQLITE_PROBLEMS if connection.vendor == "sqlite" else POSTGRES_PROBLEMS
+    found = []
+    for line in plan:
+        for pattern, kind in patterns:
+            match = pattern.search(line.strip())
+            if match:
+                found.append(f"{kind} {match.group('table')}".strip())
+    return found
+
+
+def check_plans(names=None):
+    """Yield (name, sql, plan, problems) for every query the hot paths run."""
+    for name, func in HOT_QUERIES.items():
+        if names and name not in names:
+            continue
+        with CaptureQueriesContext(connection) as captured:
+            func()
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # Small tables are cheaper to scan; judge the plans as if
+                # the catalog were big.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for query in captured.captured_queries:
+                plan = explain(query["sql"])
+                yield name, query["sql"], plan, problems(plan)
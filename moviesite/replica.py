@@ -0,0 +1,165 @@
+"""Read replica routing.
+
+Views wrapped in ``replica_reads`` (or using ``ReplicaReadMixin``) read
+from the ``REPLICA_DATABASE`` alias; everything else, and every write,
+uses ``default``. After a POST/PUT/PATCH/DELETE the browser gets a signed
+cookie that pins its reads to the primary for ``REPLICA_PIN_SECONDS``, so
+users see their own writes even while the replica lags behind.
+The decorator, the mixin and the middleware also work with async views.
+
+Anything kept in a cache (the genre sidebar, anonymous pages, the data
+behind ETags) is read from ``default`` with ``primary_reads()``. A page
+whose body did come from the replica is sent without ETag and
+Last-Modified, since the replica may be older than those validators.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+
+PIN_COOKIE = "pin_primary"
+PIN_SALT = "moviesite.replica"
+
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+_pinned = contextvars.ContextVar("pinned_to_primary", default=False)
+# Aliases read from during the current replica view, a set shared with
+# the threads the view's queries run in.
+_replica_used = contextvars.ContextVar("replica_used", default=None)
+
+
+def replica_alias():
+    alias = getattr(settings, "REPLICA_DATABASE", None)
+    return alias if alias in settings.DATABASES else None
+
+
+def _pin_seconds():
+    return getattr(settings, "REPLICA_PIN_SECONDS", 5)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and _use_replica.get() and not _pinned.get():
+            used = _replica_used.get()
+            if used is not None:
+                used.add(alias)
+            return alias
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica is a copy of the primary and is never migrated itself.
+        return db != replica_alias()
+
+
+@contextmanager
+def primary_reads():
+    """Read from ``default`` inside a replica view, e.g. to fill a cache."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _finish(response):
+    # Template responses render lazily; render them on the replica too.
+    if hasattr(response, "render") and not response.is_rendered:
+        response.render()
+    if _replica_used.get() and response.status_code == 200:
+        # The validators were read from the primary; don't let a client
+        # revalidate a page the replica rendered before catching up.
+        response.headers.pop("ETag", None)
+        response.headers.pop("Last-Modified", None)
+    return response
+
+
+def _run(view, *args, **kwargs):
+    token, used = _use_replica.set(True), _replica_used.set(set())
+    try:
+        return _finish(view(*args, **kwargs))
+    finally:
+        _use_replica.reset(token)
+        _replica_used.reset(used)
+
+
+async def _arun(view, *args, **kwargs):
+    token, used = _use_replica.set(True), _replica_used.set(set())
+    try:
+        return _finish(await view(*args, **kwargs))
+    finally:
+        _use_replica.reset(token)
+        _replica_used.reset(used)
+
+
+def replica_reads(view):
+    """Send a function view's reads to the replica."""
+    if iscoroutinefunction(view):
+        async def wrapper(request, *args, **kwargs):
+            return await _arun(view, request, *args, **kwargs)
+    else:
+        def wrapper(request, *args, **kwargs):
+            return _run(view, request, *args, **kwargs)
+    return wraps(view)(wrapper)
+
+
+class ReplicaReadMixin:
+    """Send a class-based view's reads to the replica."""
+
+    def dispatch(self, request, *args, **kwargs):
+        run = _arun if self.view_is_async else _run
+        return run(super().dispatch, request, *args, **kwargs)
+
+
+class ReadYourWritesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _pinned.set(self._is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned.set(self._is_pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self._pin(request, response)
+
+    def _pin(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS") and replica_alias():
+            seconds = _pin_seconds()
+            response.set_signed_cookie(
+                PIN_COOKIE, int(time.time()) + seconds, salt=PIN_SALT,
+                max_age=seconds, httponly=True, samesite="Lax",
+            )
+        return response
+
+    def _is_pinned(self, request):
+        try:
+            until = int(request.get_signed_cookie(PIN_COOKIE, salt=PIN_SALT))
+        except (KeyError, ValueError, signing.BadSignature):
+            return False
+        return until > time.time()
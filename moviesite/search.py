@@ -0,0 +1,117 @@
+"""Movie search backed by an SQLite FTS5 table.
+
+``movies_fts`` holds title, director and description with the movie id as
+rowid. Signals keep it in sync and ``manage.py rebuild_search_index``
+refills it. On other databases search falls back to icontains lookups.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Movie
+
+FTS_TABLE = "movies_fts"
+# Column weights for bm25(): title matches count most.
+WEIGHTS = (10.0, 5.0, 1.0)
+# Control characters can't appear in user text, so they are safe markers
+# to put around matches before escaping the snippet.
+MARK_START, MARK_END = "\x02", "\x03"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == "sqlite"
+
+
+def match_expression(query):
+    """Turn free text into a safe FTS5 query: every word as a quoted prefix."""
+    return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(query))
+
+
+def index_movie(movie):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [movie.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, director, description) VALUES (%s, %s, %s, %s)",
+            [movie.pk, movie.title, movie.director or "", movie.description or ""],
+        )
+
+
+def unindex_movie(pk):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def rebuild_index():
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, director, description) "
+            f"SELECT id, title, COALESCE(director, ''), COALESCE(description, '') FROM {Movie._meta.db_table}"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def search_ids(query, limit=20, published_only=True):
+    """Ranked [(movie_id, snippet_html)] for ``query``, best match first."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    published = "AND m.published" if published_only else ""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT m.id, snippet({FTS_TABLE}, 2, %s, %s, '…', 16) "
+            f"FROM {FTS_TABLE} JOIN {Movie._meta.db_table} m ON m.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s {published} "
+            f"ORDER BY bm25({FTS_TABLE}, %s, %s, %s) LIMIT %s",
+            [MARK_START, MARK_END, expression, *WEIGHTS, limit],
+        )
+        rows = cursor.fetchall()
+    return [
+        (pk, escape(snippet).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>"))
+        for pk, snippet in rows
+    ]
+
+
+def matching_ids(query):
+    """A subquery of every movie id matching ``query``, for ``pk__in``."""
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match_expression(query)])
+
+
+def like_search(query, limit=20):
+    """The icontains fallback: published movies containing every word."""
+    words = TOKEN_RE.findall(query)
+    if not words:
+        return []
+    condition = Q()
+    for word in words:
+        condition &= Q(title__icontains=word) | Q(director__icontains=word) | Q(description__icontains=word)
+    movies = list(Movie.objects.filter(condition, published=True).select_related("genre", "author__profile")[:limit])
+    for movie in movies:
+        movie.snippet = escape(movie.description or "")
+    return movies
+
+
+def search_movies(query, limit=20):
+    """Published movies matching ``query`` with a ``snippet`` attribute."""
+    if not fts_available():
+        return like_search(query, limit)
+
+    hits = search_ids(query, limit)
+    movies = Movie.objects.select_related("genre", "author__profile").in_bulk([pk for pk, _ in hits])
+    results = []
+    for pk, snippet in hits:
+        if pk in movies:
+            movies[pk].snippet = snippet
+            results.append(movies[pk])
+    return results
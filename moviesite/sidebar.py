@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+
+from .models import Genre
+from .replica import primary_reads
+
+SIDEBAR_KEY = "genre_sidebar"
+
+
+def _cache():
+    return caches[getattr(settings, "SIDEBAR_CACHE", "default")]
+
+
+def _timeout():
+    return getattr(settings, "SIDEBAR_TIMEOUT", 60)
+
+
+def _sidebar_query():
+    return Genre.objects.annotate(
+        movie_count=Count("movies", filter=Q(movies__published=True))
+    ).order_by("type").values("id", "type", "movie_count")
+
+
+def get_genre_sidebar():
+    """Genres with their published movie counts, cached until one changes."""
+    cache = _cache()
+    genres = cache.get(SIDEBAR_KEY)
+    if genres is None:
+        # Kept until the next change, so never filled from a lagging replica.
+        with primary_reads():
+            genres = list(_sidebar_query())
+        cache.set(SIDEBAR_KEY, genres, _timeout())
+    return genres
+
+
+async def aget_genre_sidebar():
+    cache = _cache()
+    genres = cache.get(SIDEBAR_KEY)
+    if genres is None:
+        with primary_reads():
+            genres = [genre async for genre in _sidebar_query()]
+        cache.set(SIDEBAR_KEY, genres, _timeout())
+    return genres
+
+
+def invalidate_genre_sidebar():
+    _cache().delete(SIDEBAR_KEY)
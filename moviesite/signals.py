@@ -0,0 +1,88 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django_cleanup.signals import cleanup_post_delete
+
+from . import tasks
+from .conditional import bump_catalog_version
+from .images import delete_derivatives, has_derivatives
+from .models import Comment, Genre, Movie, UserProfile
+from .pagecache import purge_tags
+from .search import index_movie, unindex_movie
+from .taskqueue import enqueue
+from .sidebar import invalidate_genre_sidebar
+
+# Fields that decide whether and where a movie shows up in listings.
+LISTING_FIELDS = ("published", "release", "genre_id")
+
+
+@receiver([post_save, post_delete], sender=Genre)
+@receiver([post_save, post_delete], sender=Movie)
+def genre_sidebar_changed(sender, **kwargs):
+    invalidate_genre_sidebar()
+
+
+@receiver([post_save, post_delete], sender=Genre)
+@receiver([post_save, post_delete], sender=Movie)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(pre_save, sender=Movie)
+def remember_listing_fields(sender, instance, **kwargs):
+    old = Movie.objects.filter(pk=instance.pk).values(*LISTING_FIELDS).first() if instance.pk else None
+    instance._listing_changed = old is None or any(
+        old[field] != getattr(instance, field) for field in LISTING_FIELDS
+    )
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, created, **kwargs):
+    tags = [f"movie:{instance.pk}"]
+    if created or getattr(instance, "_listing_changed", True):
+        tags.append("movies")
+    purge_tags(*tags)
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted(sender, instance, **kwargs):
+    purge_tags(f"movie:{instance.pk}", "movies")
+
+
+@receiver(post_save, sender=Movie)
+def movie_search_index(sender, instance, **kwargs):
+    index_movie(instance)
+
+
+@receiver(post_delete, sender=Movie)
+def movie_search_unindex(sender, instance, **kwargs):
+    unindex_movie(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Genre)
+def genre_changed(sender, instance, **kwargs):
+    # "genres" covers every page with the sidebar.
+    purge_tags(f"genre:{instance.pk}", "genres")
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    purge_tags(f"movie:{instance.movie_id}")
+
+
+@receiver(post_save, sender=Movie)
+def movie_cover_saved(sender, instance, **kwargs):
+    if instance.cover and not has_derivatives(instance.cover):
+        enqueue(tasks.generate_image_derivatives, "moviesite.Movie", instance.pk, "cover")
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_avatar_saved(sender, instance, **kwargs):
+    if instance.avatar and not has_derivatives(instance.avatar):
+        enqueue(tasks.generate_image_derivatives, "moviesite.UserProfile", instance.pk, "avatar")
+
+
+@receiver(cleanup_post_delete)
+def image_deleted(sender, file, file_name, success, **kwargs):
+    # django_cleanup removed an old cover or avatar; drop its derivatives too.
+    if success and sender in (Movie, UserProfile):
+        delete_derivatives(file.storage, file_name)
@@ -0,0 +1,91 @@
+// Katta videolarni bo'laklab, uzilsa davom ettirib yuklash
+document.addEventListener("DOMContentLoaded", () => {
+  const form = document.querySelector("form[data-upload-url]");
+  if (!form) return;
+
+  const startUrl = form.dataset.uploadUrl;
+  const input = form.querySelector('input[type="file"][name="video"]');
+  const hidden = form.querySelector('input[name="video_upload"]');
+  const progress = form.querySelector(".upload-progress");
+  const csrf = form.querySelector('input[name="csrfmiddlewaretoken"]').value;
+  const MAX_RETRIES = 5;
+
+  form.addEventListener("submit", async (event) => {
+    if (!input || !input.files.length || hidden.value) return;
+    event.preventDefault();
+    try {
+      hidden.value = await uploadFile(input.files[0]);
+      // Fayl allaqachon serverda, formani usiz yuboramiz
+      input.value = "";
+      form.submit();
+    } catch (err) {
+      progress.textContent = `Yuklashda xatolik: ${err.message}`;
+    }
+  });
+
+  async function uploadFile(file) {
+    const key = `video-upload:${file.name}:${file.size}:${file.lastModified}`;
+    let status = null;
+
+    // Oldingi uzilgan yuklashni davom ettirish
+    const savedId = localStorage.getItem(key);
+    if (savedId) {
+      const resp = await fetch(`${startUrl}${savedId}/`);
+      if (resp.ok) status = await resp.json();
+    }
+    if (!status) {
+      const body = new FormData();
+      body.append("filename", file.name);
+      body.append("size", file.size);
+      const resp = await fetch(startUrl, {
+        method: "POST",
+        headers: { "X-CSRFToken": csrf },
+        body,
+      });
+      status = await resp.json();
+      if (!resp.ok) throw new Error(status.error);
+      localStorage.setItem(key, status.id);
+    }
+
+    let retries = 0;
+    while (!status.completed) {
+      const end = Math.min(status.offset + status.chunk_size, file.size);
+      const chunk = await file.slice(status.offset, end).arrayBuffer();
+      const digest = await crypto.subtle.digest("SHA-256", chunk);
+      const hex = Array.from(new Uint8Array(digest))
+        .map((b) => b.toString(16).padStart(2, "0"))
+        .join("");
+
+      let resp;
+      try {
+        resp = await fetch(`${startUrl}${status.id}/`, {
+          method: "PUT",
+          headers: {
+            "X-CSRFToken": csrf,
+            "Upload-Offset": status.offset,
+            "Upload-Checksum": `sha256 ${hex}`,
+          },
+          body: chunk,
+        });
+      } catch (err) {
+        resp = null;
+      }
+
+      if (resp && (resp.ok || resp.status === 409)) {
+        // 409 bo'lsa server qaytargan offsetdan davom etamiz
+        status = { ...status, ...(await resp.json()) };
+        retries = 0;
+      } else if (resp && resp.status !== 422 && resp.status < 500) {
+        throw new Error((await resp.json()).error);
+      } else if (++retries > MAX_RETRIES) {
+        throw new Error("server javob bermayapti");
+      } else {
+        await new Promise((r) => setTimeout(r, 1000 * 2 ** retries));
+      }
+      progress.textContent = `${Math.floor((status.offset / file.size) * 100)}%`;
+    }
+
+    localStorage.removeItem(key);
+    return status.id;
+  }
+});
@@ -0,0 +1,226 @@
+"""Hashed, precompressed static files served by the app itself.
+
+``CompressedManifestStaticFilesStorage`` is Django's manifest storage
+(``css/style.css`` is also written as ``css/style.<hash>.css``) that
+additionally writes ``.gz`` and, when the ``brotli`` package is installed,
+``.br`` copies of each file during collectstatic.
+
+``StaticFilesMiddleware`` serves STATIC_ROOT from an index built at
+startup. It picks the precompressed copy the client accepts and marks
+hashed names immutable, so no separate static server is needed.
+"""
+import gzip
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, StreamingHttpResponse
+from django.templatetags.static import static
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .streaming import CHUNK_SIZE
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Formats that are compressed already; another pass saves next to nothing.
+SKIP_EXTENSIONS = {
+    ".avif", ".br", ".gif", ".gz", ".ico", ".jpeg", ".jpg", ".mp4",
+    ".png", ".webm", ".webp", ".woff", ".woff2", ".zip",
+}
+# A compressed copy is kept only if it is at least 5% smaller.
+MIN_RATIO = 0.95
+# Preferred first.
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Files `manage.py vendor_assets` downloads into moviesite/static/vendor/.
+VENDOR_ASSETS = {
+    "bootstrap.min.css": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css",
+    # The manifest storage fails on a sourceMappingURL to a missing file.
+    "bootstrap.min.css.map": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css.map",
+}
+
+
+def vendor_url(name):
+    """The local copy with VENDOR_ASSETS, the CDN otherwise."""
+    if getattr(settings, "VENDOR_ASSETS", False):
+        return static(f"vendor/{name}")
+    return VENDOR_ASSETS[name]
+
+
+def compressors():
+    # mtime=0 keeps .gz files identical between builds.
+    found = {"gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        found["br"] = lambda data: brotli.compress(data, quality=11)
+    return found
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        hashed = set(self.hashed_files.values())
+        names = sorted(
+            name for name in {*paths, *hashed}
+            if os.path.splitext(name)[1].lower() not in SKIP_EXTENSIONS
+        )
+        # zlib and brotli release the GIL while compressing.
+        with ThreadPoolExecutor() as pool:
+            for name, written in zip(names, pool.map(lambda name: self._compress(name, name in hashed), names)):
+                for compressed_name in written:
+                    yield name, compressed_name, True
+
+    def _compress(self, name, hashed):
+        with self.open(name) as f:
+            data = f.read()
+        written = []
+        for encoding, compress in compressors().items():
+            target = name + SUFFIXES[encoding]
+            if hashed and self.exists(target):
+                # Same name, same content: it was compressed by an earlier run.
+                continue
+            compressed = compress(data)
+            # An old copy of an unhashed name must not outlive its source.
+            if self.exists(target):
+                self.delete(target)
+            if len(compressed) <= len(data) * MIN_RATIO:
+                self._save(target, ContentFile(compressed))
+                written.append(target)
+        return written
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        try:
+            if params.startswith("q=") and float(params[2:]) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAsset:
+    """A file under STATIC_ROOT and its precompressed copies."""
+
+    def __init__(self, path, cache_control):
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.cache_control = cache_control
+        self.variants = {}
+        for encoding, suffix in [(None, ""), *SUFFIXES.items()]:
+            try:
+                stat = os.stat(path + suffix)
+            except FileNotFoundError:
+                continue
+            mtime = int(stat.st_mtime)
+            # Each encoding is a different representation with its own ETag.
+            etag = quote_etag(f"{stat.st_size:x}-{mtime:x}" + (f"-{encoding}" if encoding else ""))
+            self.variants[encoding] = (path + suffix, stat.st_size, mtime, etag)
+
+    def negotiate(self, request):
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        for encoding in SUFFIXES:
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return encoding
+        return None
+
+    def response(self, request, asynchronous=False):
+        encoding = self.negotiate(request)
+        path, size, mtime, etag = self.variants[encoding]
+        response = get_conditional_response(request, etag=etag, last_modified=mtime)
+        if response is None:
+            if asynchronous:
+                response = StreamingHttpResponse(_aread(path), content_type=self.content_type)
+            else:
+                response = FileResponse(open(path, "rb"), content_type=self.content_type)
+                # FileResponse names the file; these are not downloads.
+                del response["Content-Disposition"]
+            response["Content-Length"] = str(size)
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(mtime)
+        response["Cache-Control"] = self.cache_control
+        if len(self.variants) > 1:
+            response["Vary"] = "Accept-Encoding"
+        return response
+
+
+async def _aread(path, chunk_size=CHUNK_SIZE):
+    file = await sync_to_async(open, thread_sensitive=False)(path, "rb")
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while data := await read(chunk_size):
+            yield data
+    finally:
+        file.close()
+
+
+def build_index(root):
+    """{name relative to ``root``: StaticAsset} for every file in ``root``."""
+    hashed = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+    max_age = f"public, max-age={getattr(settings, 'STATIC_MAX_AGE', 60)}"
+    index = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            base, suffix = os.path.splitext(path)
+            if suffix in SUFFIXES.values() and os.path.exists(base):
+                continue
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            index[name] = StaticAsset(path, IMMUTABLE if name in hashed else max_age)
+    return index
+
+
+class StaticFilesMiddleware:
+    """Serve collected static files; goes right after SecurityMiddleware.
+
+    Files collected after startup are served after the next restart.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        url = urlsplit(settings.STATIC_URL or "")
+        root = settings.STATIC_ROOT
+        if not getattr(settings, "SERVE_STATIC", False) or url.netloc or not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = url.path
+        self.files = build_index(root)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def find(self, request):
+        if request.method not in ("GET", "HEAD") or not request.path.startswith(self.prefix):
+            return None
+        return self.files.get(request.path[len(self.prefix):])
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        asset = self.find(request)
+        if asset is None:
+            return self.get_response(request)
+        return asset.response(request)
+
+    async def __acall__(self, request):
+        asset = self.find(request)
+        if asset is None:
+            return await self.get_response(request)
+        return asset.response(request, asynchronous=True)
@@ -0,0 +1,221 @@
+import mimetypes
+import re
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+CHUNK_SIZE = 64 * 1024
+MAX_RANGES = 16
+
+RANGE_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def parse_range_header(header, size):
+    """Parse a ``Range: bytes=...`` header into (start, end) pairs.
+
+    ``end`` is inclusive, as in the header. Returns None when the header
+    is malformed (it must then be ignored) and an empty list when none of
+    the ranges can be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        match = RANGE_RE.match(part)
+        if not match or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if first == "":
+            # Suffix range: the last N bytes.
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        if start < size:
+            ranges.append((start, end))
+    return _merge(ranges)
+
+
+def _merge(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def file_iterator(field_file, start, length, chunk_size=CHUNK_SIZE):
+    # The file is opened on first iteration, so HEAD requests never open it.
+    file = field_file.storage.open(field_file.name, "rb")
+    try:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+async def afile_iterator(field_file, start, length, chunk_size=CHUNK_SIZE):
+    """file_iterator() for ASGI.
+
+    Reads run in a thread pool and the event loop serves other requests
+    while a slow client drains the previous chunk.
+    """
+    file = await sync_to_async(field_file.storage.open, thread_sensitive=False)(field_file.name, "rb")
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        file.seek(start)
+        while length > 0:
+            data = await read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def _multipart_iterator(field_file, ranges, size, content_type, boundary):
+    for start, end in ranges:
+        yield _part_header(boundary, content_type, start, end, size)
+        yield from file_iterator(field_file, start, end - start + 1)
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+async def _amultipart_iterator(field_file, ranges, size, content_type, boundary):
+    for start, end in ranges:
+        yield _part_header(boundary, content_type, start, end, size)
+        async for data in afile_iterator(field_file, start, end - start + 1):
+            yield data
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+def _part_header(boundary, content_type, start, end, size):
+    return (
+        f"--{boundary}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+    ).encode()
+
+
+def _validators(field_file):
+    try:
+        size = field_file.size
+        try:
+            mtime = int(field_file.storage.get_modified_time(field_file.name).timestamp())
+        except NotImplementedError:
+            mtime = None
+    except OSError:
+        # The row points at a file that is gone from the storage.
+        raise Http404("Video topilmadi")
+    etag = quote_etag(f"{size:x}-{mtime or 0:x}")
+    return size, mtime, etag
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.headers.get("If-Range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        # Strong comparison; weak ETags never match.
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and mtime is not None and date == mtime
+
+
+def _sendfile_response(field_file, content_type, etag, mtime):
+    mode = getattr(settings, "VIDEO_SENDFILE", None)
+    response = HttpResponse(content_type=content_type)
+    if mode == "x-accel-redirect":
+        prefix = getattr(settings, "VIDEO_ACCEL_REDIRECT_PREFIX", "/protected/")
+        response["X-Accel-Redirect"] = prefix + field_file.name
+    else:
+        response["X-Sendfile"] = field_file.path
+    response["ETag"] = etag
+    if mtime is not None:
+        response["Last-Modified"] = http_date(mtime)
+    return response
+
+
+def serve_file(request, field_file, asynchronous=False):
+    """Stream a stored file with Range, If-Range and ETag support.
+
+    ``asynchronous`` streams the body with async iterators, for async views.
+    """
+    content_type = mimetypes.guess_type(field_file.name)[0] or "application/octet-stream"
+    size, mtime, etag = _validators(field_file)
+
+    if getattr(settings, "VIDEO_SENDFILE", None):
+        # The front server handles ranges and conditional requests itself.
+        return _sendfile_response(field_file, content_type, etag, mtime)
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == "*"):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    ranges = None
+    range_header = request.headers.get("Range")
+    if range_header and _if_range_matches(request, etag, mtime):
+        ranges = parse_range_header(range_header, size)
+
+    if ranges == [] or (ranges and len(ranges) > MAX_RANGES):
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    stream = afile_iterator if asynchronous else file_iterator
+    if not ranges:
+        response = StreamingHttpResponse(
+            stream(field_file, 0, size),
+            content_type=content_type,
+        )
+        response["Content-Length"] = str(size)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            stream(field_file, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        boundary = uuid.uuid4().hex
+        length = sum(
+            len(_part_header(boundary, content_type, start, end, size)) + (end - start + 1) + 2
+            for start, end in ranges
+        ) + len(f"--{boundary}--\r\n")
+        response = StreamingHttpResponse(
+            (_amultipart_iterator if asynchronous else _multipart_iterator)(
+                field_file, ranges, size, content_type, boundary
+            ),
+            status=206,
+            content_type=f"multipart/byteranges; boundary={boundary}",
+        )
+        response["Content-Length"] = str(length)
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    if mtime is not None:
+        response["Last-Modified"] = http_date(mtime)
+    return response
@@ -0,0 +1,143 @@
+"""A small job queue stored in the ``tasks`` table.
+
+Any module-level function can be queued::
+
+    from moviesite.taskqueue import enqueue
+    enqueue(tasks.generate_image_derivatives, "moviesite.Movie", movie.pk, "cover")
+
+Workers (``manage.py run_worker``) claim due tasks with a conditional
+UPDATE, which works the same on SQLite and PostgreSQL. A claimed task is
+invisible to other workers until ``locked_until``; if the worker dies, the
+task becomes claimable again after the visibility timeout. Failed tasks are
+retried with exponential backoff until ``max_attempts`` is reached.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Avg, Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+from .writer import serialized_write
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *args, delay=0, max_attempts=3, **kwargs):
+    """Queue ``func(*args, **kwargs)``; arguments must be JSON-serializable.
+
+    The row is written in the caller's transaction, so the task only becomes
+    visible to workers once that transaction commits. With TASK_QUEUE_EAGER
+    the function runs right away instead.
+    """
+    if _setting("TASK_QUEUE_EAGER", False):
+        func(*args, **kwargs)
+        return None
+    return Task.objects.create(
+        name=task_name(func),
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+@serialized_write
+def claim(worker_id, limit):
+    """Lock up to ``limit`` due tasks for ``worker_id`` and return them."""
+    now = timezone.now()
+    visibility = timedelta(seconds=_setting("TASK_QUEUE_VISIBILITY_TIMEOUT", 300))
+    due = Q(status=Task.QUEUED, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+    candidates = Task.objects.filter(due).order_by("run_at").values_list("pk", flat=True)[:limit * 2]
+
+    claimed = []
+    for pk in candidates:
+        # Only one worker can win this UPDATE for a given task.
+        updated = Task.objects.filter(pk=pk).filter(due).update(
+            status=Task.RUNNING,
+            locked_by=worker_id,
+            locked_until=now + visibility,
+            attempts=F("attempts") + 1,
+            started=now,
+        )
+        if updated:
+            claimed.append(pk)
+        if len(claimed) == limit:
+            break
+    return claimed
+
+
+def execute(pk, worker_id):
+    """Run one claimed task. Safe to call from a thread or a child process."""
+    close_old_connections()
+    try:
+        task = Task.objects.get(pk=pk, locked_by=worker_id, status=Task.RUNNING)
+    except Task.DoesNotExist:
+        return
+    try:
+        import_string(task.name)(*task.args, **task.kwargs)
+    except Exception:
+        _failed(task, traceback.format_exc())
+    else:
+        Task.objects.filter(pk=pk, locked_by=worker_id).update(
+            status=Task.DONE, finished=timezone.now(), locked_until=None,
+        )
+    finally:
+        close_old_connections()
+
+
+def _failed(task, error):
+    now = timezone.now()
+    if task.attempts >= task.max_attempts:
+        logger.error("Task %s (%s) failed for good:\n%s", task.pk, task.name, error)
+        changes = {"status": Task.FAILED, "finished": now}
+    else:
+        backoff = _setting("TASK_QUEUE_RETRY_BACKOFF", 10) * 2 ** (task.attempts - 1)
+        logger.warning("Task %s (%s) failed, retrying in %ss", task.pk, task.name, backoff)
+        changes = {"status": Task.QUEUED, "run_at": now + timedelta(seconds=backoff)}
+    Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+        last_error=error, locked_until=None, **changes,
+    )
+
+
+def queue_stats(window=timedelta(hours=1)):
+    """Queue depth per status and latency of tasks finished in ``window``."""
+    depth = dict(Task.objects.values_list("status").annotate(n=Count("pk")).order_by())
+    finished = Task.objects.filter(status=Task.DONE, finished__gte=timezone.now() - window)
+    latency = finished.aggregate(
+        wait=Avg(F("started") - F("created")),
+        run=Avg(F("finished") - F("started")),
+        total=Avg(F("finished") - F("created")),
+        count=Count("pk"),
+    )
+    return {
+        "depth": {status: depth.get(status, 0) for status, _ in Task.STATUS_CHOICES},
+        "finished": latency.pop("count"),
+        "latency": {k: v.total_seconds() if v is not None else None for k, v in latency.items()},
+    }
+
+
+def latency_by_task(window=timedelta(hours=1)):
+    """{task name: count and average latencies} for tasks finished in ``window``."""
+    rows = Task.objects.filter(status=Task.DONE, finished__gte=timezone.now() - window).values("name").annotate(
+        wait=Avg(F("started") - F("created")),
+        run=Avg(F("finished") - F("started")),
+        total=Avg(F("finished") - F("created")),
+        count=Count("pk"),
+    ).order_by("name")
+    return {
+        row["name"]: {"count": row["count"], **{k: row[k].total_seconds() for k in ("wait", "run", "total")}}
+        for row in rows
+    }
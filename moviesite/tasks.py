@@ -0,0 +1,46 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+
+from .counters import flush_views
+from .fragments import invalidate_movie_card
+from .images import generate_derivatives
+from .models import Movie, Task
+from .pagecache import purge_tags
+from .taskqueue import enqueue, task_name
+
+
+def generate_image_derivatives(model_label, pk, field_name):
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, field_name)
+    if field_file:
+        generate_derivatives(field_file)
+    if isinstance(instance, Movie):
+        # Cards and pages rendered before now show the plain <img>.
+        invalidate_movie_card(instance)
+        purge_tags(f"movie:{pk}")
+
+
+def flush_movie_views():
+    flush_views()
+
+
+def clear_expired_sessions():
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+    schedule_session_cleanup(delay=getattr(settings, "SESSION_CLEANUP_INTERVAL", 60 * 60 * 24))
+
+
+def schedule_session_cleanup(delay=0):
+    """Queue clear_expired_sessions() unless a run is already queued.
+
+    Each run queues the next one, so one call keeps the job going; extra
+    chains started by several workers fold into one. Eager mode would run
+    the chain forever in the caller, use ``manage.py clearsessions`` there.
+    """
+    if getattr(settings, "TASK_QUEUE_EAGER", False):
+        return
+    if not Task.objects.filter(name=task_name(clear_expired_sessions), status=Task.QUEUED).exists():
+        enqueue(clear_expired_sessions, delay=delay)
@@ -0,0 +1,47 @@
+"""Template backends that report render time to moviesite.metrics."""
+from django.conf import settings
+from django.template.backends import jinja2
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import TemplateTimer
+
+
+def public_engine():
+    """Engine alias for the public pages: 'django' or 'jinja2'."""
+    return getattr(settings, "PUBLIC_TEMPLATE_ENGINE", "django")
+
+
+class PublicTemplateMixin:
+    """Render a class-based view with the PUBLIC_TEMPLATE_ENGINE."""
+
+    @property
+    def template_engine(self):
+        return public_engine()
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with TemplateTimer():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class TimedJinja2Template(jinja2.Template):
+    def render(self, context=None, request=None):
+        with TemplateTimer():
+            return super().render(context, request)
+
+
+class TimedJinja2(jinja2.Jinja2):
+    def from_string(self, template_code):
+        return TimedJinja2Template(self.env.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedJinja2Template(super().get_template(template_name).template, self)
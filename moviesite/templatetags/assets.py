@@ -0,0 +1,11 @@
+from django import template
+
+from moviesite.staticfiles import vendor_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor_asset(name):
+    """URL of a third-party file: vendored with VENDOR_ASSETS, the CDN otherwise."""
+    return vendor_url(name)
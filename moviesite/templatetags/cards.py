@@ -0,0 +1,12 @@
+from django import template
+
+from moviesite.fragments import render_movie_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def movie_cards(context, movies):
+    """All cards of a listing, reusing cached fragments."""
+    user = context.get("user")
+    return render_movie_cards(movies, staff=bool(user and user.is_staff), using="django")
@@ -0,0 +1,25 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from moviesite.images import MIME_TYPES, derivative_formats, has_derivatives, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, alt="", sizes="100vw", **attrs):
+    """<picture> with AVIF/WebP derivatives and the original as fallback."""
+    img = format_html(
+        '<img src="{}" alt="{}"{} loading="lazy" />',
+        field_file.url,
+        alt,
+        format_html_join("", ' {}="{}"', ((k.replace("_", "-"), v) for k, v in attrs.items())),
+    )
+    if not has_derivatives(field_file):
+        return img
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}" />',
+        ((MIME_TYPES[fmt], srcset(field_file, fmt), sizes) for fmt in derivative_formats()),
+    )
+    return format_html("<picture>{}{}</picture>", sources, img)
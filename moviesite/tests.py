@@ -1,3 +1,637 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages import INFO
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections
+from django.db.models import Sum
+from django.http import Http404, HttpResponse
+from django.template import engines
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .counters import FLUSH_LOCK_KEY, flush_views, record_view
+from .export import MOVIE_COLUMNS
+from .management.commands.compare_templates import normalize
+from .metrics import observe
+from .models import Comment, Genre, Movie, Task, UserProfile, VideoUpload
+from .pagination import CursorPaginator
+from .querybudget import QueryBudgetTestMixin
+from .replica import replica_reads
+from .search import rebuild_index
+from .sidebar import get_genre_sidebar
+from .taskqueue import claim, enqueue, execute
+from .tasks import flush_movie_views
+from .streaming import CHUNK_SIZE, serve_file
+from .uploads import UploadError, start_upload, write_chunk
+from .views import MOVIES_PER_PAGE
+
+# Tests don't run collectstatic, so there is no manifest to look names up in.
+PLAIN_STATIC = {
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def make_movie(title="Kino", genre=None, **kwargs):
+    genre = genre or Genre.objects.get_or_create(type="Drama")[0]
+    return Movie.objects.create(title=title, genre=genre, release=date(2020, 1, 1), **kwargs)
+
+
+class TemporaryMediaMixin:
+    """Store uploads in a directory removed after the test class."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
+        super().setUpClass()
+
+
+def run_threads(target, count):
+    """Run ``target(n)`` in ``count`` threads at once and re-raise the first error."""
+    errors = []
+    barrier = threading.Barrier(count)
+
+    def run(n):
+        try:
+            barrier.wait()
+            target(n)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+class ViewCounterTests(TransactionTestCase):
+    def setUp(self):
+        caches[settings.VIEW_COUNTER_CACHE].clear()
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0)
+    def test_concurrent_views_are_not_lost(self):
+        # With no interval every view also tries to flush, so views are
+        # buffered while other threads read, write and decr() the buffer.
+        movies = [make_movie(f"Kino {i}").pk for i in range(3)]
+        expected = Counter()
+        for n in range(8):
+            for i in range(50):
+                expected[movies[(n + i) % len(movies)]] += 1
+
+        def viewer(n):
+            for i in range(50):
+                record_view(movies[(n + i) % len(movies)])
+
+        run_threads(viewer, 8)
+        flush_views()
+        self.assertEqual(dict(Movie.objects.values_list("pk", "views")), dict(expected))
+
+    def test_flush_reads_only_viewed_movies(self):
+        viewed, other = make_movie("Viewed"), make_movie("Other")
+        # Keep record_view() from flushing on its own.
+        caches[settings.VIEW_COUNTER_CACHE].add(FLUSH_LOCK_KEY, 1, timeout=None)
+        for _ in range(3):
+            record_view(viewed.pk)
+        self.assertEqual(flush_views(), 3)
+        self.assertEqual(flush_views(), 0)
+        record_view(viewed.pk)
+        self.assertEqual(flush_views(), 1)
+        viewed.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((viewed.views, other.views), (4, 0))
+
+    def test_command_refuses_a_per_process_buffer(self):
+        with self.assertRaises(CommandError):
+            call_command("flush_views")
+
+
+@override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0, TASK_QUEUE_EAGER=False)
+class SQLiteConcurrencyTests(TransactionTestCase):
+    """Readers, view flushes, comment inserts and task claims at once.
+
+    Any "database is locked" in a thread fails the test.
+    """
+    READERS, VIEWERS, COMMENTERS, WORKERS = 4, 4, 2, 2
+    VIEWS, COMMENTS, TASKS = 50, 20, 30
+
+    def setUp(self):
+        caches[settings.VIEW_COUNTER_CACHE].clear()
+        self.movies = [make_movie(f"Kino {i}").pk for i in range(5)]
+
+    def read(self):
+        for _ in range(self.VIEWS):
+            list(Movie.objects.filter(published=True).select_related("genre")[:20])
+            Movie.objects.aggregate(Sum("views"))
+
+    def view(self, n):
+        for i in range(self.VIEWS):
+            record_view(self.movies[(n + i) % len(self.movies)])
+
+    def comment(self, n):
+        for i in range(self.COMMENTS):
+            Comment.objects.create(text=f"Izoh {n}.{i}", movie_id=self.movies[i % len(self.movies)])
+
+    def work(self, n):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            claimed = claim(f"worker-{n}", 5)
+            for pk in claimed:
+                execute(pk, f"worker-{n}")
+            if not claimed and not Task.objects.filter(status__in=[Task.QUEUED, Task.RUNNING]).exists():
+                return
+            if not claimed:
+                time.sleep(0.01)
+
+    def run_everything(self):
+        for _ in range(self.TASKS):
+            enqueue(flush_movie_views)
+        roles = (
+            [lambda n: self.read()] * self.READERS
+            + [self.view] * self.VIEWERS
+            + [self.comment] * self.COMMENTERS
+            + [self.work] * self.WORKERS
+        )
+        run_threads(lambda n: roles[n](n), len(roles))
+        flush_views()
+
+        self.assertEqual(connection.cursor().execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(Movie.objects.aggregate(total=Sum("views"))["total"], self.VIEWERS * self.VIEWS)
+        self.assertEqual(Comment.objects.count(), self.COMMENTERS * self.COMMENTS)
+        # Each task claimed once and run to the end.
+        self.assertEqual(set(Task.objects.values_list("status", "attempts")), {(Task.DONE, 1)})
+
+    def test_without_write_queue(self):
+        with override_settings(SQLITE_WRITE_QUEUE=False):
+            self.run_everything()
+
+    def test_with_write_queue(self):
+        with override_settings(SQLITE_WRITE_QUEUE=True):
+            self.run_everything()
+
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Each public page stays within its view's budget with several rows per relation."""
+
+    @classmethod
+    def setUpTestData(cls):
+        genres = [Genre.objects.create(type=f"Janr {i}") for i in range(3)]
+        users = [User.objects.create_user(f"user{i}", password="parol") for i in range(3)]
+        for user in users:
+            UserProfile.objects.create(user=user)
+        for i in range(12):
+            movie = make_movie(f"Kino {i}", genre=genres[i % 3], author=users[i % 3])
+            for user in users:
+                Comment.objects.create(text="Zo'r kino", movie=movie, user=user)
+        cls.urls = [
+            reverse("main"),
+            reverse("movies_by_genre", args=[genres[0].pk]),
+            reverse("movie_detail", args=[movie.pk]),
+            reverse("profile_detail", args=[users[0].username]),
+        ]
+        cls.staff = User.objects.create_superuser("admin", "admin@example.com", "parol")
+
+    def setUp(self):
+        # Cached pages, sidebar and cards would hide the queries.
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def assertPagesWithinBudget(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.assertWithinQueryBudget(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_anonymous(self):
+        self.assertPagesWithinBudget()
+
+    def test_staff(self):
+        self.client.force_login(self.staff)
+        self.assertPagesWithinBudget()
+
+
+class MovieApiTests(TestCase):
+    def test_genre_filter(self):
+        drama, comedy = Genre.objects.create(type="Drama"), Genre.objects.create(type="Komediya")
+        movie = make_movie("Drama kino", genre=drama)
+        make_movie("Komediya kino", genre=comedy)
+        response = self.client.get(reverse("api_movie_list"), {"genre": drama.pk})
+        results = json.loads(b"".join(response.streaming_content))["results"]
+        self.assertEqual([m["id"] for m in results], [movie.pk])
+
+    def test_comments_etag_follows_edits(self):
+        movie = make_movie()
+        comment = Comment.objects.create(text="Zo'r", movie=movie)
+        url = reverse("api_movie_comments", args=[movie.pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+
+        comment.text = "Zo'r kino"
+        comment.save()
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["text"], "Zo'r kino")
+
+    def test_invalid_genre(self):
+        response = self.client.get(reverse("api_movie_list"), {"genre": "abc"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "genre must be a number"})
+
+
+class ExportCatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        drama, comedy = Genre.objects.create(type="Drama"), Genre.objects.create(type="Komediya")
+        cls.drama = drama
+        author = User.objects.create_user("muallif", password="parol")
+        cls.movie = make_movie("Qora, \"oq\" kino", genre=drama, director="Rejissyor",
+                               description="Ikki\nqatorli tavsif", author=author)
+        make_movie("Kulgili", genre=comedy, published=False)
+        Comment.objects.create(text="Zo'r", movie=cls.movie, user=author)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command("export_catalog", *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv_round_trip(self):
+        rows = list(csv.DictReader(StringIO(self.export("movies"))))
+        expected = [
+            {column: "" if value is None else str(value) for column, value in zip(MOVIE_COLUMNS, row)}
+            for row in Movie.objects.order_by("pk").values_list(*MOVIE_COLUMNS)
+        ]
+        self.assertEqual(rows, expected)
+
+    def test_jsonl_round_trip(self):
+        rows = [json.loads(line) for line in self.export("comments", "--format", "jsonl").splitlines()]
+        comment = Comment.objects.get()
+        self.assertEqual(rows, [{
+            "id": comment.pk, "movie_id": self.movie.pk, "movie__title": self.movie.title,
+            "user__username": "muallif", "text": "Zo'r", "created": DjangoJSONEncoder().default(comment.created),
+        }])
+
+    def test_genre_filter(self):
+        rows = list(csv.DictReader(StringIO(self.export("movies", "--genre", str(self.drama.pk)))))
+        self.assertEqual([row["title"] for row in rows], [self.movie.title])
+
+
+class AdminSearchTests(TestCase):
+    def search(self, term):
+        model_admin = admin.site._registry[Movie]
+        request = RequestFactory().get("/admin/moviesite/movie/", {"q": term})
+        queryset, _ = model_admin.get_search_results(request, Movie.objects.all(), term)
+        return queryset
+
+    def test_every_match_is_returned(self):
+        genre = Genre.objects.create(type="Drama")
+        Movie.objects.bulk_create(
+            Movie(title=f"Qasos {i}", genre=genre, release=date(2020, 1, 1)) for i in range(1200)
+        )
+        Movie.objects.create(title="Boshqa", genre=genre, release=date(2020, 1, 1))
+        rebuild_index()
+        self.assertEqual(self.search("qasos").count(), 1200)
+        self.assertEqual(self.search("!!").count(), 0)
+
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class CatalogVersionTests(TestCase):
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def test_version_is_shared_through_the_database(self):
+        make_movie()
+        etag = self.client.get(reverse("main"))["ETag"]
+        # Another worker starts with empty caches and must agree.
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        response = self.client.get(reverse("main"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        make_movie("Yangi kino")
+        response = self.client.get(reverse("main"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class TemplateEngineParityTests(TestCase):
+    """The Jinja2 ports must render what the DTL templates render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.create(type="Drama")
+        author = User.objects.create_user("muallif", password="parol")
+        for i in range(MOVIES_PER_PAGE + 1):
+            make_movie(f"Kino {i}", cls.genre, author=author, director="Rejissyor", description="<b>Tavsif</b> 'matn'")
+        cls.staff = User.objects.create_user("admin", password="parol", is_staff=True)
+
+    def render(self, engine, name, context, user):
+        caches[settings.FRAGMENT_CACHE].clear()
+        request = RequestFactory().get("/")
+        request.user = user
+        request._messages = CookieStorage(request)
+        request._messages.add(INFO, "Xabar")
+        return normalize(engines[engine].get_template(name).render(context, request))
+
+    def test_pages_render_the_same(self):
+        movies = Movie.objects.filter(published=True).select_related("genre", "author__profile")
+        page_obj = CursorPaginator(movies, MOVIES_PER_PAGE).get_page(None)
+        listing = {"genres": get_genre_sidebar(), "movies": page_obj.object_list, "page_obj": page_obj}
+        movie = movies.first()
+        for user in (AnonymousUser(), self.staff):
+            cases = {
+                "main": ("moviesite/main.html", {**listing, "title": "main"}),
+                "genre": ("moviesite/main.html", {**listing, "title": self.genre.type}),
+                "movie": ("moviesite/movie.html", {"movie": movie, "title": movie.title}),
+                "card": ("moviesite/_movie_card.html", {"movie": movie, "staff": user.is_staff}),
+                "pagination": ("moviesite/pagination.html", {"page_obj": page_obj}),
+            }
+            for case, (name, context) in cases.items():
+                with self.subTest(case, staff=user.is_staff):
+                    self.assertEqual(
+                        self.render("jinja2", name, context, user),
+                        self.render("django", name, context, user),
+                    )
+
+
+# The primary stands in for the replica, so reads routed to it can be seen.
+@override_settings(STORAGES=PLAIN_STATIC, REPLICA_DATABASE="default")
+class ReplicaReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = make_movie()
+        cls.user = User.objects.create_user("tomoshabin", password="parol")
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def test_page_rendered_from_the_replica_has_no_validators(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("movie_detail", args=[self.movie.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_cached_page_is_rendered_from_the_primary(self):
+        response = self.client.get(reverse("movie_detail", args=[self.movie.pk]))
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        self.assertIn("ETag", response)
+
+    def test_sidebar_is_filled_from_the_primary(self):
+        def view(request):
+            response = HttpResponse(str(get_genre_sidebar()))
+            response["ETag"] = '"v1"'
+            return response
+
+        response = replica_reads(view)(RequestFactory().get("/"))
+        self.assertEqual(response["ETag"], '"v1"')
+
+
+class VideoStreamingTests(TemporaryMediaMixin, TestCase):
+    # Several read chunks; 251 is prime, so every offset has its own pattern.
+    SIZE = 4 * CHUNK_SIZE + 123
+    DATA = (bytes(range(251)) * (SIZE // 251 + 1))[:SIZE]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = make_movie("Video")
+        cls.movie.video.save("film.mp4", ContentFile(cls.DATA))
+        cls.url = reverse("movie_video", args=[cls.movie.pk])
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_whole_file(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], str(self.SIZE))
+        self.assertEqual(body, self.DATA)
+
+    def test_range_in_the_middle(self):
+        # Starts in one read chunk and ends in the next.
+        start, end = 2 * CHUNK_SIZE - 10, 2 * CHUNK_SIZE + 9
+        response, body = self.get(Range=f"bytes={start}-{end}")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/{self.SIZE}")
+        self.assertEqual(response["Content-Length"], "20")
+        self.assertEqual(body, self.DATA[start:end + 1])
+
+    def test_open_ended_and_suffix_ranges(self):
+        response, body = self.get(Range=f"bytes={self.SIZE - 100}-")
+        self.assertEqual((response.status_code, body), (206, self.DATA[-100:]))
+        response, body = self.get(Range="bytes=-500")
+        self.assertEqual(response["Content-Range"], f"bytes {self.SIZE - 500}-{self.SIZE - 1}/{self.SIZE}")
+        self.assertEqual(body, self.DATA[-500:])
+        # A suffix longer than the file is the whole file.
+        response, body = self.get(Range=f"bytes=-{self.SIZE * 2}")
+        self.assertEqual((response.status_code, body), (206, self.DATA))
+
+    def test_multiple_ranges(self):
+        ranges = [(0, 9), (CHUNK_SIZE * 3, CHUNK_SIZE * 3 + 99)]
+        response, body = self.get(Range="bytes=" + ",".join(f"{a}-{b}" for a, b in ranges))
+        self.assertEqual(response.status_code, 206)
+        content_type, _, boundary = response["Content-Type"].partition("; boundary=")
+        self.assertEqual(content_type, "multipart/byteranges")
+        self.assertEqual(response["Content-Length"], str(len(body)))
+        parts = body.split(f"--{boundary}".encode())
+        self.assertEqual(parts[0], b"")
+        self.assertEqual(parts[-1], b"--\r\n")
+        for part, (start, end) in zip(parts[1:-1], ranges):
+            headers, _, data = part.partition(b"\r\n\r\n")
+            self.assertIn(f"Content-Range: bytes {start}-{end}/{self.SIZE}".encode(), headers)
+            self.assertEqual(data, self.DATA[start:end + 1] + b"\r\n")
+
+    def test_overlapping_ranges_are_merged(self):
+        response, body = self.get(Range="bytes=100-199,150-299")
+        self.assertEqual(response["Content-Range"], f"bytes 100-299/{self.SIZE}")
+        self.assertEqual(body, self.DATA[100:300])
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get(Range=f"bytes={self.SIZE}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{self.SIZE}")
+
+    def test_malformed_range_is_ignored(self):
+        response, body = self.get(Range="bytes=abc")
+        self.assertEqual((response.status_code, body), (200, self.DATA))
+
+    def test_if_range(self):
+        etag = self.get()[0]["ETag"]
+        response, body = self.get(Range="bytes=10-19", If_Range=etag)
+        self.assertEqual((response.status_code, body), (206, self.DATA[10:20]))
+        # The file changed since the client's copy: send all of it.
+        response, body = self.get(Range="bytes=10-19", If_Range='"stale"')
+        self.assertEqual((response.status_code, body), (200, self.DATA))
+        response, body = self.get(Range="bytes=10-19", If_Range=f"W/{etag}")
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_none_match(self):
+        etag = self.get()[0]["ETag"]
+        response, body = self.get(If_None_Match=etag)
+        self.assertEqual((response.status_code, body), (304, b""))
+        self.assertEqual(response["ETag"], etag)
+        response, _ = self.get(If_None_Match='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_async_range(self):
+        start, end = 3 * CHUNK_SIZE - 1, 3 * CHUNK_SIZE + CHUNK_SIZE
+        request = RequestFactory().get(self.url, headers={"Range": f"bytes={start}-{end}"})
+        response = serve_file(request, self.movie.video, asynchronous=True)
+
+        async def read():
+            return b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(async_to_sync(read)(), self.DATA[start:end + 1])
+
+    @override_settings(STORAGES=PLAIN_STATIC)
+    def test_missing_file(self):
+        movie = make_movie("Yo'qolgan video", video="videos/missing.mp4")
+        response = self.client.get(reverse("movie_video", args=[movie.pk]))
+        self.assertEqual(response.status_code, 404)
+        request = RequestFactory().get(self.url)
+        with self.assertRaises(Http404):
+            serve_file(request, movie.video, asynchronous=True)
+
+
+class VideoValidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser("admin", "admin@example.com", "parol")
+        # Points at a file that is not in the media storage.
+        cls.movie = make_movie("Yo'qolgan video", video="videos/missing.mp4")
+
+    def test_stored_video_is_not_opened(self):
+        self.movie.full_clean()
+        self.movie.video.name = "videos/notes.txt"
+        with self.assertRaises(ValidationError):
+            self.movie.full_clean()
+
+    def test_new_upload_is_sniffed(self):
+        self.movie.video = SimpleUploadedFile("film.mp4", b"not a video at all")
+        with self.assertRaises(ValidationError):
+            self.movie.full_clean()
+        self.movie.video = SimpleUploadedFile("film.mp4", b"\0\0\0\x18ftypmp42" + bytes(16))
+        self.movie.full_clean()
+
+    @override_settings(STORAGES=PLAIN_STATIC)
+    def test_edit_keeps_a_missing_video(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse("movie_update", args=[self.movie.pk]), {
+            "title": "Yangi nom",
+            "genre": self.movie.genre_id,
+            "release": "2020-01-01",
+            "published": "on",
+        })
+        self.assertRedirects(response, reverse("main"), fetch_redirect_response=False)
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.title, self.movie.video.name), ("Yangi nom", "videos/missing.mp4"))
+
+
+class ChunkedUploadTests(TemporaryMediaMixin, TestCase):
+    DATA = b"\0\0\0\x18ftypmp42" + bytes(range(256)) * 64
+
+    def setUp(self):
+        self.upload = start_upload(None, "film.mp4", len(self.DATA))
+
+    def send(self, offset, data, stream=None):
+        upload = VideoUpload.objects.get(pk=self.upload.pk)
+        checksum = "sha256 " + hashlib.sha256(data).hexdigest()
+        return write_chunk(upload, offset, checksum, stream or BytesIO(data), len(data))
+
+    def test_failed_retry_keeps_the_written_chunk(self):
+        half = len(self.DATA) // 2
+        first, send = self.DATA[:half], self.send
+
+        class DroppedConnection:
+            # While this request reads its body, the client's retry of the
+            # same chunk arrives and wins; then the connection breaks.
+            def read(self, size):
+                send(0, first)
+                return b"\xff" * size
+
+        with self.assertRaises(UploadError) as raised:
+            self.send(0, first, stream=DroppedConnection())
+        self.assertEqual(raised.exception.status, 422)
+        with self.assertRaises(UploadError) as raised:
+            self.send(0, first)
+        self.assertEqual(raised.exception.status, 409)
+
+        upload = self.send(half, self.DATA[half:])
+        self.assertTrue(upload.completed)
+        with open(os.path.join(self.media_root, upload.video), "rb") as f:
+            self.assertEqual(f.read(), self.DATA)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "videos")), [os.path.basename(upload.video)])
+
+
+class QueueMetricsTests(TestCase):
+    def test_depth_and_latency_are_exported(self):
+        now = timezone.now()
+        Task.objects.create(name="moviesite.tasks.flush_movie_views", run_at=now)
+        done = Task.objects.create(
+            name="moviesite.tasks.flush_movie_views", run_at=now, status=Task.DONE,
+            started=now + timedelta(seconds=2), finished=now + timedelta(seconds=5),
+        )
+        # auto_now_add can't be set on create().
+        Task.objects.filter(pk=done.pk).update(created=now)
+
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('moviesite_task_queue_depth{status="queued"} 1', body)
+        self.assertIn('moviesite_task_queue_depth{status="failed"} 0', body)
+        task = 'task="moviesite.tasks.flush_movie_views"'
+        self.assertIn(f'moviesite_task_latency_seconds{{{task},phase="wait"}} 2.0', body)
+        self.assertIn(f'moviesite_task_latency_seconds{{{task},phase="run"}} 3.0', body)
+        self.assertIn(f'moviesite_task_finished{{{task}}} 1', body)
+
+    def test_scrape_flushes_idle_threads(self):
+        caches[settings.METRICS_CACHE].clear()
+        observed, done = threading.Event(), threading.Event()
+
+        def worker():
+            observe("response_size_bytes", "about", 100)
+            observed.set()
+            # Stay alive and idle, so nothing but the scrape flushes the buffer.
+            done.wait(5)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        try:
+            observed.wait(5)
+            body = self.client.get(reverse("metrics")).content.decode()
+        finally:
+            done.set()
+            thread.join()
+        self.assertIn('moviesite_response_size_bytes_count{route="about"} 1', body)
@@ -0,0 +1,136 @@
+"""Resumable chunked uploads for Movie.video.
+
+Protocol (all endpoints are staff-only and return JSON):
+
+1. ``POST /upload/video/`` with ``filename`` and ``size`` creates an upload
+   and returns its ``id``, the current ``offset`` and the ``chunk_size``.
+2. ``PUT /upload/video/<id>/`` sends the next chunk as the raw request
+   body, with ``Upload-Offset: <offset>`` and
+   ``Upload-Checksum: sha256 <hexdigest of the chunk>`` headers.
+   A chunk whose offset or checksum does not match is rejected and the
+   client resends it.
+3. ``GET /upload/video/<id>/`` returns the current offset so an interrupted
+   upload can resume from there.
+
+Each chunk is first written to a file of its own in ``videos/`` in the
+media storage. Once its checksum matches and its offset has been claimed,
+it is copied into the upload's ``.part`` file, so a duplicate or failed
+request never touches bytes another request has written. When the last
+chunk arrives the file is sniffed and renamed to its final name; the
+upload id is then passed to MovieForm's ``video_upload`` field.
+"""
+import hashlib
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from .models import VideoUpload
+from .validators import SNIFF_BYTES, sniff_video_type
+
+UPLOAD_DIR = "videos"
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def chunk_size():
+    return getattr(settings, "VIDEO_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+
+
+def _partial_path(upload):
+    return default_storage.path(f"{UPLOAD_DIR}/{upload.pk}.part")
+
+
+def _chunk_path(upload):
+    return default_storage.path(f"{UPLOAD_DIR}/{upload.pk}.{uuid.uuid4().hex}.chunk")
+
+
+def start_upload(user, filename, size):
+    if not filename or size <= 0:
+        raise UploadError("Fayl nomi va hajmi kerak.")
+    upload = VideoUpload.objects.create(user=user, filename=os.path.basename(filename), size=size)
+    os.makedirs(os.path.dirname(_partial_path(upload)), exist_ok=True)
+    open(_partial_path(upload), "wb").close()
+    return upload
+
+
+def write_chunk(upload, offset, checksum, stream, length):
+    """Write one chunk at ``offset``; returns the refreshed upload."""
+    if upload.completed:
+        raise UploadError("Yuklash allaqachon tugagan.", status=409)
+    if offset != upload.offset:
+        raise UploadError(f"Offset {upload.offset} kutilgan edi.", status=409)
+    if length <= 0 or length > chunk_size() or offset + length > upload.size:
+        raise UploadError("Bo'lak hajmi noto'g'ri.", status=413)
+
+    algorithm, _, expected = (checksum or "").partition(" ")
+    if algorithm.lower() != "sha256" or not expected:
+        raise UploadError("Upload-Checksum: sha256 <hex> sarlavhasi kerak.")
+
+    digest = hashlib.sha256()
+    chunk_path = _chunk_path(upload)
+    try:
+        with open(chunk_path, "wb") as chunk:
+            remaining = length
+            while remaining > 0:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                digest.update(data)
+                chunk.write(data)
+                remaining -= len(data)
+        if remaining or digest.hexdigest() != expected.strip().lower():
+            raise UploadError("Bo'lak nazorat summasi mos kelmadi.", status=422)
+
+        with transaction.atomic():
+            # Only one request may move the offset forward. The chunk is
+            # copied in the same transaction, so a request for the next
+            # chunk can't claim its offset until these bytes are in place.
+            updated = VideoUpload.objects.filter(
+                pk=upload.pk, offset=offset, completed=False,
+            ).update(offset=F("offset") + length)
+            if not updated:
+                raise UploadError("Bu bo'lak allaqachon yozilgan.", status=409)
+            with open(chunk_path, "rb") as chunk, open(_partial_path(upload), "r+b") as part:
+                part.seek(offset)
+                shutil.copyfileobj(chunk, part, READ_SIZE)
+    finally:
+        os.remove(chunk_path)
+
+    upload.refresh_from_db()
+    if upload.offset == upload.size:
+        _finish(upload)
+    return upload
+
+
+def _finish(upload):
+    path = _partial_path(upload)
+    with open(path, "rb") as part:
+        kind = sniff_video_type(part.read(SNIFF_BYTES))
+    if kind is None:
+        os.remove(path)
+        upload.delete()
+        raise UploadError("Faqat mp4, mkv yoki avi video fayllarni yuklash mumkin.", status=415)
+
+    stem = os.path.splitext(upload.filename)[0] or "video"
+    name = default_storage.get_available_name(f"{UPLOAD_DIR}/{stem}.{kind}")
+    os.replace(path, default_storage.path(name))
+    upload.video = name
+    upload.completed = True
+    upload.save(update_fields=["video", "completed"])
+
+
+def attach_upload(movie, upload):
+    """Point ``movie.video`` at a finished upload."""
+    movie.video.name = upload.video
+    movie.save(update_fields=["video"])
+    upload.delete()
@@ -1,23 +1,40 @@
 from django.conf import settings
 from django.urls import path, include
-from . import views
+from . import api, async_views, metrics, views
+
+# The public read pages run as async views when served by project.asgi.
+pages = async_views if settings.ASYNC_VIEWS else views
+
+api_urlpatterns = [
+    path('movies/', api.movie_list, name='api_movie_list'),
+    path('movies/<int:movie_id>/', api.movie_detail, name='api_movie_detail'),
+    path('movies/<int:movie_id>/comments/', api.movie_comments, name='api_movie_comments'),
+    path('genres/', api.genre_list, name='api_genre_list'),
+    path('profiles/<str:username>/', api.profile_detail, name='api_profile_detail'),
+]
 
 urlpatterns = [
-    path('', views.movie_list, name='main'),
+    path('', pages.movie_list, name='main'),
     path('about/', views.AboutView.as_view(), name='about'),
-    path('genre/<int:genre_id>/', views.MoviesByGenre.as_view(), name='movies_by_genre'),
-    path('movie/<int:movie_id>/', views.MovieDetail.as_view(), name='movie_detail'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('genre/<int:genre_id>/', pages.MoviesByGenre.as_view(), name='movies_by_genre'),
+    path('movie/<int:movie_id>/', pages.MovieDetail.as_view(), name='movie_detail'),
+    path('movie/<int:movie_id>/video/', pages.movie_video, name='movie_video'),
     path('movie/add/', views.MovieCreate.as_view(), name='movie_create'),
     path('movie/<int:movie_id>/update/', views.MovieUpdate.as_view(), name='movie_update'),
     path('movie/<int:movie_id>/delete/', views.MovieDelete.as_view(), name='movie_delete'),
+    path('upload/video/', views.video_upload_start, name='video_upload_start'),
+    path('upload/video/<uuid:upload_id>/', views.video_upload_chunk, name='video_upload_chunk'),
     path('genre/add/', views.GenreCreate.as_view(), name='genre_create'),
     path('genre/<int:genre_id>/update/', views.GenreUpdate.as_view(), name='genre_update'),
     path('genre/<int:genre_id>/delete/', views.GenreDelete.as_view(), name='genre_delete'),
-    path('profile/<str:username>/', views.ProfileDetail.as_view(), name='profile_detail'),
+    path('profile/<str:username>/', pages.ProfileDetail.as_view(), name='profile_detail'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
     path('register/', views.register_view, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('api/v1/', include(api_urlpatterns)),
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,39 @@
+import os
+
+from django.core.exceptions import ValidationError
+
+SNIFF_BYTES = 16
+VIDEO_EXTENSIONS = ("mp4", "mkv", "avi")
+
+
+def sniff_video_type(head):
+    """Guess the container from the first bytes of a file."""
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "mkv"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "avi"
+    return None
+
+
+def validate_video_content(file):
+    """Sniff a new upload; a stored file is only checked by its extension.
+
+    Saving a movie validates its current video too, and that must not open
+    (or fail on) a file the edit doesn't touch.
+    """
+    if getattr(file, "_committed", False):
+        valid = os.path.splitext(file.name)[1].lower().lstrip(".") in VIDEO_EXTENSIONS
+    else:
+        position = file.tell() if hasattr(file, "tell") else None
+        file.seek(0)
+        head = file.read(SNIFF_BYTES)
+        if position is not None:
+            file.seek(position)
+        valid = sniff_video_type(head) is not None
+    if not valid:
+        raise ValidationError(
+            "Faqat mp4, mkv yoki avi video fayllarni yuklash mumkin.",
+            code="invalid_video",
+        )
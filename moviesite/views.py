@@ -2,29 +2,52 @@ from django.contrib.auth import login, authenticate, logout
 from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
 from django.shortcuts import redirect, get_object_or_404, render
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_http_methods
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.core.paginator import Paginator
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
-from .models import Genre, Movie, UserProfile
+from .models import Genre, Movie, UserProfile, VideoUpload
 from .forms import MovieForm, GenreForm
-
-
-class MainView(ListView):
+from .counters import record_view
+from .pagination import CursorPaginator, CursorPaginationMixin
+from .querybudget import query_budget, QueryBudgetMixin
+from .sidebar import get_genre_sidebar
+from .pagecache import add_cache_tags, anonymous_page_cache, AnonymousPageCacheMixin
+from .streaming import serve_file
+from .uploads import UploadError, attach_upload, chunk_size, start_upload, write_chunk
+from .search import search_movies
+from .conditional import catalog_validators, conditional_page, ConditionalPageMixin
+from .replica import replica_reads, ReplicaReadMixin
+from .template_backends import public_engine, PublicTemplateMixin
+
+MOVIES_PER_PAGE = 3
+
+
+def tag_listing(request, genres, movies):
+    add_cache_tags(
+        request, "movies", "genres",
+        *[f"genre:{genre['id']}" for genre in genres],
+        *[f"movie:{movie.pk}" for movie in movies],
+    )
+
+
+class MainView(QueryBudgetMixin, CursorPaginationMixin, ListView):
     model = Movie
     template_name = "moviesite/main.html"
     context_object_name = "movies"
+    paginate_by = MOVIES_PER_PAGE
+    max_queries = 4
 
     def get_queryset(self):
-        return Movie.objects.filter(published=True)
+        return Movie.objects.filter(published=True).select_related("genre", "author__profile")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["genres"] = Genre.objects.all()
+        context["genres"] = get_genre_sidebar()
         context["title"] = "main"
-        messages.info(self.request, "Xush kelibsiz! Asosiy sahifasidasiz.")
         return context
 
 
@@ -37,34 +60,80 @@ class AboutView(TemplateView):
         return context
 
 
-class MoviesByGenre(ListView):
+class MoviesByGenre(ReplicaReadMixin, ConditionalPageMixin, AnonymousPageCacheMixin, QueryBudgetMixin, CursorPaginationMixin,
+                    PublicTemplateMixin, ListView):
     model = Movie
     template_name = "moviesite/main.html"
     context_object_name = "movies"
+    paginate_by = MOVIES_PER_PAGE
+    max_queries = 4
 
     def get_queryset(self):
-        return Movie.objects.filter(genre_id=self.kwargs["genre_id"], published=True)
+        return Movie.objects.filter(
+            genre_id=self.kwargs["genre_id"], published=True
+        ).select_related("genre", "author__profile")
+
+    def get(self, request, *args, **kwargs):
+        self.select_genre(get_genre_sidebar())
+        return super().get(request, *args, **kwargs)
+
+    def select_genre(self, genres):
+        self.genres = genres
+        self.genre = next((g for g in genres if g["id"] == self.kwargs["genre_id"]), None)
+        if self.genre is None:
+            raise Http404("Janr topilmadi")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        genre = get_object_or_404(Genre, pk=self.kwargs["genre_id"])
-        context["genres"] = Genre.objects.all()
-        context["title"] = genre.type
+        context["genres"] = self.genres
+        context["title"] = self.genre["type"]
+        tag_listing(self.request, self.genres, context["movies"])
         return context
 
 
-class MovieDetail(DetailView):
+class SearchView(TemplateView):
+    template_name = "moviesite/search.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "").strip()
+        context["query"] = query
+        context["movies"] = search_movies(query) if query else []
+        context["title"] = f"Qidiruv: {query}" if query else "Qidiruv"
+        return context
+
+
+class MovieDetail(ReplicaReadMixin, ConditionalPageMixin, AnonymousPageCacheMixin, QueryBudgetMixin, PublicTemplateMixin,
+                  DetailView):
     model = Movie
     template_name = "moviesite/movie.html"
     context_object_name = "movie"
     pk_url_kwarg = "movie_id"
+    max_queries = 7
+
+    def get_queryset(self):
+        return Movie.objects.select_related("genre", "author__profile")
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
-        obj.views += 1
-        obj.save()
+        record_view(obj.pk)
+        add_cache_tags(self.request, f"movie:{obj.pk}")
         return obj
 
+    def page_cache_hit(self, request, *args, **kwargs):
+        record_view(kwargs[self.pk_url_kwarg])
+
+    def get_validators(self):
+        updated = Movie.objects.filter(
+            pk=self.kwargs[self.pk_url_kwarg]
+        ).values_list("updated", flat=True).first()
+        if updated is None:
+            return None
+        return updated.timestamp(), updated
+
+    def not_modified(self):
+        record_view(self.kwargs[self.pk_url_kwarg])
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["title"] = self.object.title
@@ -82,7 +151,10 @@ class MovieCreate(UserPassesTestMixin, CreateView):
 
     def form_valid(self, form):
         messages.success(self.request, "Film muvaffaqiyatli qo'shildi!")
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        if form.cleaned_data.get("video_upload"):
+            attach_upload(self.object, form.cleaned_data["video_upload"])
+        return response
 
     def form_invalid(self, form):
         messages.error(self.request, "Film qo'shishda xatolik yuz berdi!")
@@ -101,7 +173,10 @@ class MovieUpdate(UserPassesTestMixin, UpdateView):
 
     def form_valid(self, form):
         messages.success(self.request, "Film muvaffaqiyatli yangilandi!")
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        if form.cleaned_data.get("video_upload"):
+            attach_upload(self.object, form.cleaned_data["video_upload"])
+        return response
 
     def form_invalid(self, form):
         messages.error(self.request, "Film yangilashda xatolik yuz berdi!")
@@ -173,14 +248,27 @@ class GenreDelete(UserPassesTestMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class ProfileDetail(DetailView):
+class ProfileDetail(ReplicaReadMixin, QueryBudgetMixin, DetailView):
     model = UserProfile
     template_name = "moviesite/profile_detail.html"
     context_object_name = "profile"
+    max_queries = 5
 
     def get_object(self, queryset=None):
-        user = get_object_or_404(User, username=self.kwargs["username"])
-        return get_object_or_404(UserProfile, user=user)
+        return get_object_or_404(
+            UserProfile.objects.select_related("user"),
+            user__username=self.kwargs["username"],
+        )
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        user = self.object.user
+        context = self.get_context_data(
+            object=self.object,
+            movie_count=user.movie_set.count(),
+            comment_count=user.comment_set.count(),
+        )
+        return self.render_to_response(context)
 
 
 class ProfileView(LoginRequiredMixin, TemplateView):
@@ -232,9 +320,72 @@ def logout_view(request):
     messages.success(request, "Siz tizimdan chiqdingiz.")
     return redirect("main")
 
+@replica_reads
+@conditional_page(catalog_validators)
+@anonymous_page_cache
+@query_budget(4)
 def movie_list(request):
-    movies = Movie.objects.all().order_by('-id')
-    paginator = Paginator(movies, 3)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return render(request, 'moviesite/main.html', {'page_obj': page_obj})
+    movies = Movie.objects.filter(published=True).select_related("genre", "author__profile")
+    paginator = CursorPaginator(movies, MOVIES_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    genres = get_genre_sidebar()
+    tag_listing(request, genres, page_obj)
+    return render(request, 'moviesite/main.html', {
+        'genres': genres,
+        'movies': page_obj.object_list,
+        'page_obj': page_obj,
+    }, using=public_engine())
+
+
+def movie_video(request, movie_id):
+    movie = get_object_or_404(Movie.objects.only("id", "video"), pk=movie_id)
+    if not movie.video:
+        raise Http404("Video topilmadi")
+    return serve_file(request, movie.video)
+
+
+def upload_json(upload):
+    return {
+        "id": str(upload.pk),
+        "offset": upload.offset,
+        "size": upload.size,
+        "chunk_size": chunk_size(),
+        "completed": upload.completed,
+    }
+
+
+@require_http_methods(["POST"])
+def video_upload_start(request):
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Ruxsat yo'q"}, status=403)
+    try:
+        size = int(request.POST.get("size", 0))
+        upload = start_upload(request.user, request.POST.get("filename", ""), size)
+    except ValueError:
+        return JsonResponse({"error": "Hajm noto'g'ri"}, status=400)
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    return JsonResponse(upload_json(upload), status=201)
+
+
+@require_http_methods(["GET", "PUT"])
+def video_upload_chunk(request, upload_id):
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Ruxsat yo'q"}, status=403)
+    upload = get_object_or_404(VideoUpload, pk=upload_id, user=request.user)
+    if request.method == "GET":
+        return JsonResponse(upload_json(upload))
+
+    try:
+        upload = write_chunk(
+            upload,
+            int(request.headers.get("Upload-Offset", -1)),
+            request.headers.get("Upload-Checksum"),
+            request,
+            int(request.headers.get("Content-Length") or 0),
+        )
+    except ValueError:
+        return JsonResponse({"error": "Upload-Offset noto'g'ri"}, status=400)
+    except UploadError as e:
+        return JsonResponse({"error": str(e), **upload_json(upload)}, status=e.status)
+    return JsonResponse(upload_json(upload))
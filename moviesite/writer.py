@@ -0,0 +1,56 @@
+"""Optional single-writer thread for SQLite.
+
+SQLite allows one writer at a time. With ``SQLITE_WRITE_QUEUE = True``,
+writes passed to ``run_write()`` are queued onto one thread of this
+process, so the process's writers wait their turn instead of fighting for
+the lock. Writes made inside an open transaction run inline, since they
+must be part of it.
+"""
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+_executor = None
+_lock = threading.Lock()
+_writer = threading.local()
+
+
+def enabled():
+    return getattr(settings, "SQLITE_WRITE_QUEUE", False) and connection.vendor == "sqlite"
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+            atexit.register(_executor.shutdown)
+        return _executor
+
+
+def _run(func, args, kwargs):
+    _writer.active = True
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _writer.active = False
+        close_old_connections()
+
+
+def run_write(func, *args, **kwargs):
+    """Call ``func`` on the writer thread and return its result."""
+    if not enabled() or connection.in_atomic_block or getattr(_writer, "active", False):
+        return func(*args, **kwargs)
+    return _get_executor().submit(_run, func, args, kwargs).result()
+
+
+def serialized_write(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_write(func, *args, **kwargs)
+    return wrapper
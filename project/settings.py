@@ -40,31 +40,64 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'moviesite.apps.MoviesiteConfig',
     'django_cleanup.apps.CleanupConfig',
-    'debug_toolbar',
 ]
 
 
+# moviesite.middleware holds Django's middleware with the hooks run in the
+# event loop under ASGI; under WSGI they are the stock classes.
 MIDDLEWARE = [
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'moviesite.metrics.MetricsMiddleware',
+    'moviesite.middleware.SecurityMiddleware',
+    'moviesite.staticfiles.StaticFilesMiddleware',
+    'moviesite.replica.ReadYourWritesMiddleware',
+    'moviesite.middleware.SessionMiddleware',
+    'moviesite.middleware.CommonMiddleware',
+    'moviesite.middleware.CsrfViewMiddleware',
+    'moviesite.middleware.AuthenticationMiddleware',
+    'moviesite.middleware.MessageMiddleware',
+    'moviesite.middleware.XFrameOptionsMiddleware',
 ]
 
+# The debug toolbar is for development only.
+if DEBUG:
+    INSTALLED_APPS += ['debug_toolbar']
+    MIDDLEWARE.insert(1, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'NAME': 'django',
+        'BACKEND': 'moviesite.template_backends.TimedDjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates'
         ],
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+            # Parse each template once per process. The runserver autoreloader
+            # still resets this cache when a template changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+    {
+        # Jinja2 versions of the public pages; see PUBLIC_TEMPLATE_ENGINE.
+        'NAME': 'jinja2',
+        'BACKEND': 'moviesite.template_backends.TimedJinja2',
+        'DIRS': [
+            BASE_DIR / 'jinja2'
+        ],
         'APP_DIRS': True,
         'OPTIONS': {
+            'environment': 'moviesite.jinja2env.environment',
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -84,6 +117,25 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections between requests (WSGI only; see "Async views"
+        # and "SQLite tuning" below).
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so it is
+            # waited for (busy_timeout) instead of failing on upgrade.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        # A file, so tests can use the database from several threads.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -138,4 +190,204 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 INTERNAL_IPS = [
    '127.0.0.1',
-]
\ No newline at end of file
+]
+
+# Caches
+# Buffered page views have a cache of their own, so pages and fragments
+# never evict them before they are written. With LocMemCache each
+# process buffers and flushes its own views. Use Redis or Memcached
+# (shared, with atomic incr()) to run `manage.py flush_views` or a
+# worker flush; the database cache would lose concurrent increments.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'views': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'movie-views',
+        'TIMEOUT': None,
+        # Three entries per movie viewed since the last flush; never culled.
+        'OPTIONS': {'MAX_ENTRIES': 1_000_000},
+    },
+    'metrics': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'metrics',
+        'TIMEOUT': None,
+        # Counters must never be culled, or scraped totals would go down.
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        # Anonymous pages and their tag versions; see "Anonymous page cache".
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # 'views': {
+    #     'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    #     'LOCATION': 'redis://127.0.0.1:6379/1',
+    #     'TIMEOUT': None,
+    # },
+}
+
+# Movie view counter
+# Page views are buffered in the cache and written to the database in
+# batches; each flush reads only the movies viewed since the last one.
+
+VIEW_COUNTER_CACHE = 'views'
+VIEW_COUNTER_FLUSH_INTERVAL = 60  # seconds
+
+# Genre sidebar
+# The genre list with movie counts is cached and deleted whenever a genre
+# or movie changes. The delete only reaches the cache of the process that
+# made the change, so with LocMemCache other workers show the old counts
+# for up to SIDEBAR_TIMEOUT seconds. With a shared cache (Redis,
+# Memcached) every worker sees the delete and the timeout can be a day.
+
+SIDEBAR_CACHE = 'default'
+SIDEBAR_TIMEOUT = 60  # seconds
+
+# Query budgets
+# Views declare how many SQL queries they may run (see moviesite.querybudget).
+# Going over the budget logs a warning, or raises when strict.
+
+QUERY_BUDGET_STRICT = DEBUG
+
+# Anonymous page cache
+# Pages rendered for anonymous visitors are cached and tagged with the
+# movies and genres they show; saving one of those purges its pages.
+# A purge bumps tag versions in PAGE_CACHE, so it reaches every worker
+# only with a shared backend (Redis, Memcached). With LocMemCache other
+# workers keep serving purged pages for up to PAGE_CACHE_TIMEOUT.
+
+PAGE_CACHE = 'pages'
+PAGE_CACHE_TIMEOUT = 60 * 5  # seconds
+
+# Video streaming
+# Videos are streamed by moviesite.streaming with Range support. Set
+# VIDEO_SENDFILE to 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache,
+# lighttpd) to hand the file over to the front server instead.
+
+VIDEO_SENDFILE = None
+VIDEO_ACCEL_REDIRECT_PREFIX = '/protected/media/'
+
+# Image derivatives
+# Covers and avatars get resized copies in media/derivatives/ for srcset.
+# AVIF is skipped when Pillow is built without it.
+
+IMAGE_DERIVATIVE_WIDTHS = (160, 320, 640, 960)
+IMAGE_DERIVATIVE_FORMATS = ('avif', 'webp')
+
+# Task queue
+# Background jobs are stored in the `tasks` table and run by
+# `manage.py run_worker`. In eager mode they run inline instead, so
+# development works without a worker.
+
+TASK_QUEUE_EAGER = DEBUG
+TASK_QUEUE_VISIBILITY_TIMEOUT = 60 * 5  # seconds
+TASK_QUEUE_RETRY_BACKOFF = 10  # seconds, doubled on each retry
+
+# SQLite tuning
+# The database runs in WAL mode, so readers never wait for the writer, and
+# a write transaction waits up to 5s for the lock. mmap_size (128 MiB) and
+# cache_size (20 MiB) are per connection. With SQLITE_WRITE_QUEUE, view
+# counter flushes and task claims in one process go through a single
+# writer thread (see moviesite.writer).
+
+SQLITE_WRITE_QUEUE = False
+
+# Read replica
+# Listing and detail pages read from REPLICA_DATABASE when that alias is
+# in DATABASES. After a write the browser reads from the primary for
+# REPLICA_PIN_SECONDS; keep it above the replica's usual lag. Cached
+# pages, the genre sidebar and ETags are built from the primary. To try it
+# locally with two SQLite files, uncomment the entry below and run
+# `manage.py sync_replica --interval 2` next to the dev server.
+
+# DATABASES['replica'] = {
+#     **DATABASES['default'],
+#     'NAME': BASE_DIR / 'db.replica.sqlite3',
+#     'TEST': {'MIRROR': 'default'},
+# }
+DATABASE_ROUTERS = ['moviesite.replica.PrimaryReplicaRouter']
+REPLICA_DATABASE = 'replica'
+REPLICA_PIN_SECONDS = 5
+
+# Metrics
+# MetricsMiddleware records per-route timings, query counts and response
+# sizes in each worker and adds them to METRICS_CACHE every
+# METRICS_FLUSH_INTERVAL seconds; /metrics serves the totals in Prometheus
+# text format. METRICS_CACHE is an alias of its own, so page and fragment
+# entries never evict counters. Use a shared cache (Redis, Memcached) so
+# the totals cover every worker.
+
+METRICS_CACHE = 'metrics'
+METRICS_FLUSH_INTERVAL = 10  # seconds
+METRICS_ALLOWED_IPS = INTERNAL_IPS  # None allows everyone
+
+# Fragment cache
+# Listing pages reuse each movie's rendered card (moviesite.fragments);
+# a card is re-rendered only after the movie changes.
+
+FRAGMENT_CACHE = 'default'
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24  # seconds
+
+# Template engine
+# The main, genre and movie pages (and their partials) also exist as
+# Jinja2 templates in jinja2/ directories. Set PUBLIC_TEMPLATE_ENGINE to
+# 'jinja2' to render them with Jinja2. `manage.py compare_templates` checks
+# that both engines produce the same HTML and times them.
+
+PUBLIC_TEMPLATE_ENGINE = 'django'
+
+# Async views
+# With ASYNC_VIEWS the listing, genre, movie, profile and video pages are
+# async views (moviesite/async_views.py). Turn it on when serving
+# project.asgi; under WSGI every async view needs its own event loop.
+# `manage.py check_async_stack` lists middleware that still runs in a
+# thread under ASGI.
+#
+# Under ASGI every request runs its sync ORM calls in a fresh thread, so a
+# persistent connection (CONN_MAX_AGE above) is opened per request and
+# never reused or closed until the thread dies. ASYNC_VIEWS therefore also
+# turns persistent connections off; anything else serving project.asgi
+# should set CONN_MAX_AGE to 0 too.
+
+ASYNC_VIEWS = False
+
+if ASYNC_VIEWS:
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = 0
+
+# Sessions and messages
+# Flash messages live in a signed cookie that is only set when a message
+# is added, so anonymous page views never create a session or send
+# Set-Cookie. Sessions are kept in the database; run_worker queues a job
+# that deletes expired sessions every SESSION_CLEANUP_INTERVAL seconds.
+# cached_db needs a cache every process shares: with LocMemCache a session
+# logged out or cycled in one process stays valid in another's copy. To
+# use it, point SESSION_CACHE_ALIAS at a Redis or Memcached entry in CACHES.
+
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# SESSION_CACHE_ALIAS = 'sessions'
+SESSION_CLEANUP_INTERVAL = 60 * 60 * 24  # seconds
+
+# Static files pipeline
+# collectstatic writes a content-hashed copy of every static file, plus
+# .gz and (with the brotli package installed) .br versions. With
+# SERVE_STATIC, moviesite.staticfiles.StaticFilesMiddleware serves
+# STATIC_ROOT itself: hashed names are cached for a year as immutable,
+# other names for STATIC_MAX_AGE seconds. Run collectstatic on every
+# deploy. With VENDOR_ASSETS the pages load Bootstrap from
+# moviesite/static/vendor/ instead of the CDN; run
+# `manage.py vendor_assets` before collectstatic to download it there.
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'moviesite.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+SERVE_STATIC = not DEBUG
+STATIC_MAX_AGE = 60  # seconds
+VENDOR_ASSETS = False